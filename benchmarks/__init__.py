@@ -0,0 +1,5 @@
+"""
+    Scaling benchmarks for the lowering pipeline and the solver. Run them with
+    `python -m benchmarks`. Each case generates a program of a given size, so
+    super-linear growth of a phase shows up when comparing sizes.
+"""
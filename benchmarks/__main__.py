@@ -0,0 +1,137 @@
+import argparse
+import json
+import sys
+
+from benchmarks.generators import CASE_SIZES, CASES, DEFAULT_SIZES
+from py2smt.check import check_inner, lower
+from py2smt.lir import write_smt
+from py2smt.profile import Profile
+
+PHASES = [
+    "parse",
+    "lower_ast_to_hir",
+    "lower_hir_to_mir",
+    "optimize_mir",
+    "lower_mir_to_lir",
+    "share_subterms",
+    "infer_logic",
+    "smt",
+    "solve",
+]
+
+
+class CountingStream:
+    """A text stream that only counts what is written to it"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text: str):
+        self.size += len(text)
+
+
+def run_pipeline(text: str, solve: bool, profile: Profile):
+    """Run all phases on `text`, returning the size of the generated SMT-LIB"""
+    stream = CountingStream()
+    if solve:
+        check_inner(text, smt_output=stream, profile=profile)
+    else:
+        _, model = lower(text, profile=profile)
+        with profile.phase("smt"):
+            write_smt(model, stream)
+    return stream.size
+
+
+def measure(case: str, size: int, solve: bool = True, memory: bool = True):
+    text = CASES[case](size)
+    profile = Profile()
+    smt_bytes = run_pipeline(text, solve, profile)
+    result = {
+        "case": case,
+        "size": size,
+        "seconds": profile.phases,
+        "queries": len(profile.queries),
+        "smt_bytes": smt_bytes,
+    }
+    if memory:
+        # Separate run, as tracing memory distorts the timings
+        memory_profile = Profile(trace_memory=True)
+        run_pipeline(text, solve, memory_profile)
+        result["peak_memory"] = memory_profile.peak_memory
+        result["live_objects"] = memory_profile.live_objects
+        result["retained_memory"] = memory_profile.retained_memory
+    return result
+
+
+def format_table(results) -> str:
+    header = ["case", "size", *PHASES, "total", "peak MiB", "SMT KiB", "queries"]
+    rows = [header]
+    for result in results:
+        seconds = result["seconds"]
+        peak = max(result.get("peak_memory", {}).values(), default=0)
+        rows.append(
+            [
+                result["case"],
+                str(result["size"]),
+                *(
+                    f"{seconds[phase]:.4f}" if phase in seconds else "-"
+                    for phase in PHASES
+                ),
+                f"{sum(seconds.values()):.4f}",
+                f"{peak / 2**20:.2f}" if "peak_memory" in result else "-",
+                f"{result['smt_bytes'] / 2**10:.1f}",
+                str(result["queries"]),
+            ]
+        )
+    widths = [max(len(row[col]) for row in rows) for col in range(len(header))]
+    return "\n".join(
+        " ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows
+    )
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Scaling benchmarks for the py2smt pipeline"
+    )
+    parser.add_argument(
+        "--case",
+        dest="cases",
+        action="append",
+        choices=list(CASES),
+        help="Case to run, can be repeated. Runs all cases by default",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda sizes: [int(size) for size in sizes.split(",")],
+        help=f"Comma-separated program sizes. Defaults to {DEFAULT_SIZES} for most cases",
+    )
+    parser.add_argument(
+        "--no-solve",
+        dest="solve",
+        action="store_false",
+        help="Only lower the programs and render SMT, without solving",
+    )
+    parser.add_argument(
+        "--no-memory",
+        dest="memory",
+        action="store_false",
+        help="Do not measure peak memory",
+    )
+    parser.add_argument("--json", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for case in args.cases or CASES:
+        for size in args.sizes or CASE_SIZES.get(case, DEFAULT_SIZES):
+            results.append(measure(case, size, args.solve, args.memory))
+            print(f"{case} {size} done", file=sys.stderr)
+
+    print(format_table(results))
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,141 @@
+"""
+    Generators for synthetic, verifiable programs whose size grows with `n`
+"""
+import typing
+
+
+def straight_line(n: int) -> str:
+    """`n` consecutive assignments, each depending on the previous one"""
+    lines = ["a0 = 0"]
+    lines.extend(f"a{i} = a{i - 1} + 1" for i in range(1, n))
+    lines.append(f"assert a{n - 1} == {n - 1}")
+    return "\n".join(lines)
+
+
+def if_chain(n: int) -> str:
+    """An `if`/`elif` chain with `n` branches, which nests `n` levels deep"""
+    lines = ["x = 0", "y = 0"]
+    for i in range(n):
+        keyword = "if" if i == 0 else "elif"
+        lines.append(f"{keyword} x == {i}:")
+        lines.append(f"    y = x + {i}")
+    lines.append("else:")
+    lines.append("    y = -1")
+    lines.append("assert y == 0")
+    return "\n".join(lines)
+
+
+def nested_reads(n: int) -> str:
+    """An `if`/`elif` chain with `n` branches that read, but do not assign,
+    variables defined at the top level"""
+    lines = [f"v{i} = {i}" for i in range(10)]
+    total = " + ".join(f"v{i}" for i in range(10))
+    for i in range(n):
+        keyword = "if" if i == 0 else "elif"
+        lines.append(f"{keyword} v0 == {i}:")
+        lines.append(f"    assert {total} == 45")
+    return "\n".join(lines)
+
+
+def nested_if(n: int) -> str:
+    """`if`/`else` statements nested `n` levels deep, assigning at every level"""
+    lines = ["x = 1", "y = 0"]
+    for depth in range(n):
+        indent = "    " * depth
+        lines.append(f"{indent}y = y + 1")
+        lines.append(f"{indent}if x > {-depth}:")
+    indent = "    " * n
+    lines.append(f"{indent}y = y + 1")
+    for depth in reversed(range(n)):
+        indent = "    " * depth
+        lines.append(f"{indent}else:")
+        lines.append(f"{indent}    y = 0")
+    lines.append(f"assert y == {n + 1}")
+    return "\n".join(lines)
+
+
+def functions(n: int) -> str:
+    """`n` functions with contracts, each called from the top level"""
+    lines = []
+    for i in range(n):
+        lines.extend(
+            [
+                "@assumes(param.a >= 0)",
+                f"@ensures(__return__ == param.a + {i})",
+                f"def f{i}(a: int) -> int:",
+                f"    return a + {i}",
+                "",
+            ]
+        )
+    lines.append("x = 0")
+    for i in range(n):
+        lines.append(f"x = f{i}(x)")
+    lines.append(f"assert x == {n * (n - 1) // 2}")
+    return "\n".join(lines)
+
+
+def hot_calls(n: int) -> str:
+    """A single function with a contract, called `n` times"""
+    lines = [
+        "@assumes(param.a >= 0, param.b >= 0, param.a + param.b >= param.a)",
+        "@ensures(__return__ == param.a + param.b, __return__ >= param.a)",
+        "def add(a: int, b: int) -> int:",
+        "    return a + b",
+        "",
+        "x = 0",
+    ]
+    for i in range(n):
+        lines.append(f"x = add(x, {i})")
+    lines.append(f"assert x == {n * (n - 1) // 2}")
+    return "\n".join(lines)
+
+
+def nested_loops(n: int) -> str:
+    """`while` loops with invariants, nested `n` levels deep"""
+    # Loop variables have to be defined before the outermost loop havocs them
+    lines = [f"i{depth} = 0" for depth in range(n)]
+    for depth in range(n):
+        indent = "    " * depth
+        if depth > 0:
+            lines.append(f"{indent}i{depth} = 0")
+        lines.append(f"{indent}while i{depth} < 2:")
+        lines.append(f"{indent}    loop_invariant(i{depth} >= 0 and i{depth} <= 2)")
+    for depth in reversed(range(n)):
+        indent = "    " * (depth + 1)
+        lines.append(f"{indent}i{depth} = i{depth} + 1")
+    lines.append("assert i0 == 2")
+    return "\n".join(lines)
+
+
+def walrus_chain(n: int) -> str:
+    """A single assignment with `n` nested assignment expressions"""
+    expr = "1"
+    for i in range(n):
+        expr = f"(b{i} := {expr} + 1)"
+    return f"a = {expr}\nassert a == {n + 1}"
+
+
+def many_asserts(n: int) -> str:
+    """`n` assignments, each followed by an assert on the whole context so far"""
+    lines = ["a0 = 0"]
+    for i in range(1, n):
+        lines.append(f"a{i} = a{i - 1} + {i}")
+        lines.append(f"assert a{i} == {i * (i + 1) // 2} and a{i} >= a{i - 1}")
+    return "\n".join(lines)
+
+
+CASES: typing.Dict[str, typing.Callable[[int], str]] = {
+    "straight_line": straight_line,
+    "if_chain": if_chain,
+    "nested_reads": nested_reads,
+    "nested_if": nested_if,
+    "functions": functions,
+    "hot_calls": hot_calls,
+    "nested_loops": nested_loops,
+    "walrus_chain": walrus_chain,
+    "many_asserts": many_asserts,
+}
+
+DEFAULT_SIZES = [10, 20, 40, 80]
+# Sizes for cases that currently blow up, so a run of all cases finishes
+CASE_SIZES: typing.Dict[str, typing.List[int]] = {}
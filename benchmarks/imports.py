@@ -0,0 +1,56 @@
+"""
+    Import cost of `py2smt` for programs that only use the annotations at runtime.
+    Run with `python -m benchmarks.imports`.
+"""
+import json
+import subprocess
+import sys
+import typing
+
+# Modules that are only needed for verification
+VERIFICATION_MODULES = [
+    "z3",
+    "unittest",
+    "py2smt.check",
+    "py2smt.hir",
+    "py2smt.mir",
+    "py2smt.lir",
+]
+
+_PROGRAM = """
+import sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+modules = sorted(set(sys.modules) - before)
+import json
+print(json.dumps({{"seconds": seconds, "modules": modules}}))
+"""
+
+
+def import_profile(module: str = "py2smt") -> typing.Dict[str, typing.Any]:
+    """Import `module` in a fresh interpreter. Returns the time it took and the
+    modules it loaded"""
+    output = subprocess.run(
+        [sys.executable, "-c", _PROGRAM.format(module=module)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    profile = import_profile()
+    heavy = [name for name in VERIFICATION_MODULES if name in profile["modules"]]
+    print(f"import py2smt: {profile['seconds'] * 1000:.2f} ms")
+    print(f"modules loaded: {len(profile['modules'])}")
+    if heavy:
+        print(f"verification modules loaded: {', '.join(heavy)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+    Solving with assumption literals compared to pushing and popping a scope
+    for every assert, on programs with many asserts. Run with
+    `python -m benchmarks.incremental`.
+"""
+import argparse
+import sys
+import typing
+
+from benchmarks.generators import CASES
+from py2smt.check import check_inner
+from py2smt.profile import Profile
+
+# Cases with an assert per statement or per branch
+ASSERTION_HEAVY = ["many_asserts", "nested_reads"]
+SIZES = [50, 100, 200]
+MODES = {"push/pop": False, "literals": True}
+
+
+def compare(case: str, size: int) -> typing.Dict[str, typing.Any]:
+    """The seconds spent solving the program of `case` in each mode. Constants
+    are not folded, as that proves most asserts without the solver"""
+    text = CASES[case](size)
+    result: typing.Dict[str, typing.Any] = {"case": case, "size": size}
+    for mode, assumption_literals in MODES.items():
+        profile = Profile()
+        _, error = check_inner(
+            text,
+            profile=profile,
+            optimize=False,
+            assumption_literals=assumption_literals,
+        )
+        assert error is None, f"{case} {size} does not verify"
+        result[mode] = profile.phases["solve"]
+        result["queries"] = len(profile.queries)
+    return result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=lambda sizes: [int(size) for size in sizes.split(",")],
+        default=SIZES,
+        help=f"Comma-separated program sizes. Defaults to {SIZES}",
+    )
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<14} {'size':>6} {'queries':>8} {'push/pop':>10} {'literals':>10}")
+    for case in ASSERTION_HEAVY:
+        for size in args.sizes:
+            result = compare(case, size)
+            print(
+                f"{case:<14} {size:>6} {result['queries']:>8} "
+                f"{result['push/pop']:>10.4f} {result['literals']:>10.4f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
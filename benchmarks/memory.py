@@ -0,0 +1,67 @@
+"""
+    Objects and memory of each phase of lowering, on large generated modules.
+    Run with `python -m benchmarks.memory`.
+"""
+import argparse
+import sys
+import typing
+
+from benchmarks.generators import CASES
+from py2smt.check import lower
+from py2smt.profile import Profile
+
+# Cases whose size is the number of top-level statements
+STATEMENT_CASES = ["straight_line", "many_asserts"]
+SIZES = [10000, 50000]
+
+
+def measure(case: str, size: int) -> typing.List[typing.Dict[str, typing.Any]]:
+    """For each phase that lowers the program of `case`, the objects it allocated
+    that are alive at its end, their size and the peak memory of the phase, in
+    bytes"""
+    profile = Profile(trace_memory=True)
+    lower(CASES[case](size), profile=profile)
+    return [
+        {
+            "phase": phase,
+            "objects": profile.live_objects[phase],
+            "retained": profile.retained_memory[phase],
+            "peak": profile.peak_memory[phase],
+        }
+        for phase in profile.phases
+    ]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--case",
+        dest="cases",
+        action="append",
+        choices=list(CASES),
+        help=f"Case to run, can be repeated. Defaults to {STATEMENT_CASES}",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda sizes: [int(size) for size in sizes.split(",")],
+        default=SIZES,
+        help=f"Comma-separated program sizes. Defaults to {SIZES}",
+    )
+    args = parser.parse_args(argv)
+
+    print(
+        f"{'case':<14} {'size':>7} {'phase':<17} {'objects':>9} "
+        f"{'retained MiB':>13} {'peak MiB':>9}"
+    )
+    for case in args.cases or STATEMENT_CASES:
+        for size in args.sizes:
+            for row in measure(case, size):
+                print(
+                    f"{case:<14} {size:>7} {row['phase']:<17} {row['objects']:>9} "
+                    f"{row['retained'] / 2**20:>13.2f} {row['peak'] / 2**20:>9.2f}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -8,3 +8,29 @@ from py2smt.annotation import (
 )
 
 __ALL__ = [__old__, __return__, param, ensures, assumes, loop_invariant]
+
+# Programs import this package for the annotations at runtime, so the verifier and
+# z3 are only loaded when they are used
+_LAZY_MODULES = {
+    "batch",
+    "cache",
+    "check",
+    "client",
+    "daemon",
+    "hir",
+    "lir",
+    "mir",
+    "portfolio",
+    "profile",
+    "report",
+    "visitor",
+    "watch",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_MODULES:
+        # Importing a submodule sets it as an attribute of this package
+        __import__(f"{__name__}.{name}")
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,49 +1,221 @@
 import argparse
-import ast
+import contextlib
 import sys
-import traceback as tb
-
-from py2smt.check import check_inner
-
-
-def format_counterexample(filename, source_code, exc):
-    frames = []
-    model = exc.model
-    ctx = exc.context
-    for val, var in model:
-        var_name = ast.get_source_segment(source_code, var.ast_node)
-        frames.append(
-            tb.FrameSummary(
-                filename=filename,
-                lineno=var.ast_node.lineno,
-                name=ctx.ctx_name,
-                locals={var_name: val},
-            )
-        )
-    context_lines = tb.format_list(frames)
-    failing_assert = tb.format_list(
-        [
-            tb.FrameSummary(
-                filename=filename, lineno=ctx.ast_node.lineno, name=ctx.ctx_name
-            )
-        ]
+
+from py2smt.batch import (
+    collect_files,
+    verify_file,
+    verify_files,
+    write_json,
+    write_junit,
+)
+from py2smt.cache import FunctionCache, StatementCache, VerdictCache
+from py2smt.portfolio import STRATEGIES, strategy_list
+from py2smt.watch import watch
+
+parser = argparse.ArgumentParser(description="Program validator for python")
+smt_output = parser.add_mutually_exclusive_group()
+smt_output.add_argument(
+    "--output-smt",
+    dest="output_smt",
+    action="store_true",
+    help="Write the SMT-LIB code used to validate the program to stdout",
+)
+smt_output.add_argument(
+    "--output-smt-file",
+    dest="output_smt_file",
+    metavar="FILE",
+    help="Write the SMT-LIB code used to validate the program to FILE",
+)
+parser.add_argument(
+    "--jobs",
+    "-j",
+    dest="jobs",
+    type=int,
+    default=1,
+    help="Number of worker processes to divide the files over, or the assertions "
+    "if there is one file",
+)
+parser.add_argument(
+    "--cache-dir",
+    dest="cache_dir",
+    help="Directory to cache verified functions, top-level statements and solver "
+    "verdicts in, to skip them in later runs",
+)
+parser.add_argument(
+    "--cache-size",
+    dest="cache_size",
+    type=int,
+    default=4096,
+    help="Maximum number of cache entries",
+)
+failure_mode = parser.add_mutually_exclusive_group()
+failure_mode.add_argument(
+    "--fail-fast",
+    dest="fail_fast",
+    action="store_true",
+    help="Stop at the first failing assert",
+)
+failure_mode.add_argument(
+    "--all",
+    dest="all_failures",
+    action="store_true",
+    help="Report all failing asserts, each with its own counterexample",
+)
+parser.add_argument(
+    "--profile",
+    dest="profile",
+    action="store_true",
+    help="Print the time taken by each phase and each assert",
+)
+parser.add_argument(
+    "--no-optimize",
+    dest="optimize",
+    action="store_false",
+    help="Do not propagate and fold constants before solving",
+)
+parser.add_argument(
+    "--slice",
+    dest="slice",
+    action="store_true",
+    help="Solve each assert with only the assumptions it depends on",
+)
+parser.add_argument(
+    "--timeout",
+    dest="timeout",
+    type=float,
+    metavar="SECONDS",
+    help="Seconds the solver may spend on each assert before it is unknown",
+)
+parser.add_argument(
+    "--budget",
+    dest="budget",
+    type=float,
+    metavar="SECONDS",
+    help="Seconds the solver may spend on all asserts of a file together",
+)
+parser.add_argument(
+    "--max-memory",
+    dest="max_memory",
+    type=int,
+    metavar="MB",
+    help="Megabytes of memory the solver may use",
+)
+parser.add_argument(
+    "--portfolio",
+    dest="portfolio",
+    type=strategy_list,
+    metavar="STRATEGIES",
+    help="Race the comma-separated solver strategies, given as NAME or "
+    f"NAME:SECONDS, on each assert. Strategies are {', '.join(STRATEGIES)}",
+)
+parser.add_argument(
+    "--escalate",
+    dest="escalate",
+    action="store_true",
+    help="Try the strategies of the portfolio in order instead of racing them",
+)
+parser.add_argument(
+    "--assumption-literals",
+    dest="assumption_literals",
+    action="store_true",
+    help="Check each assert assuming a literal instead of in a pushed scope, so "
+    "the solver keeps what it learned",
+)
+parser.add_argument(
+    "--watch",
+    dest="watch",
+    action="store_true",
+    help="Verify the files again whenever they change, solving only the asserts "
+    "affected by the change, until interrupted",
+)
+parser.add_argument(
+    "--json",
+    dest="json",
+    metavar="FILE",
+    help="Write the results and timings of all files to FILE as JSON",
+)
+parser.add_argument(
+    "--junit",
+    dest="junit",
+    metavar="FILE",
+    help="Write the results and timings of all files to FILE as JUnit XML",
+)
+parser.add_argument(
+    "paths",
+    nargs="+",
+    metavar="path",
+    help="Files to verify, or directories to verify all python files in",
+)
+
+
+def main(argv):
+    args = parser.parse_args(argv)
+    filenames = collect_files(args.paths)
+    if not filenames:
+        parser.error("No python files to verify")
+    options = dict(
+        fail_fast=args.fail_fast,
+        all_failures=args.all_failures,
+        optimize=args.optimize,
+        slice=args.slice,
+        timeout=args.timeout,
+        budget=args.budget,
+        max_memory=args.max_memory,
+        portfolio=args.portfolio,
+        escalate=args.escalate,
+        assumption_literals=args.assumption_literals,
     )
 
-    return ["The following assert fails:", *failing_assert, "When:", *context_lines]
+    if args.watch:
+        if args.output_smt or args.output_smt_file or args.json or args.junit:
+            parser.error("--watch only prints the results")
+        watch(
+            args.paths,
+            args.cache_dir,
+            cache_size=args.cache_size,
+            profile=args.profile,
+            jobs=args.jobs,
+            **options,
+        )
+        return 0
 
+    if args.cache_dir:
+        options["cache"] = FunctionCache(args.cache_dir, args.cache_size)
+        options["statement_cache"] = StatementCache(args.cache_dir, args.cache_size)
+        options["verdict_cache"] = VerdictCache(args.cache_dir, args.cache_size)
 
-parser = argparse.ArgumentParser(description="Program validator for python")
-parser.add_argument("--output-smt", dest="output_smt", action="store_true")
-parser.add_argument("filename", action="store", type=str)
-
-args = parser.parse_args(sys.argv[1:])
-with open(args.filename, "r") as file:
-    text = file.read()
-    _, smt, errors = check_inner(text)
-
-if args.output_smt:
-    print("\n".join(smt))
-if errors:
-    print("\n".join(format_counterexample(args.filename, text, errors)))
-    sys.exit(1)
-sys.exit(0)
+    if len(filenames) == 1:
+        with contextlib.ExitStack() as stack:
+            smt_output = sys.stdout if args.output_smt else None
+            if args.output_smt_file:
+                smt_output = stack.enter_context(open(args.output_smt_file, "w"))
+            results = [
+                verify_file(
+                    filenames[0], smt_output=smt_output, jobs=args.jobs, **options
+                )
+            ]
+    elif args.output_smt or args.output_smt_file:
+        parser.error("SMT-LIB output is only supported for a single file")
+    else:
+        # Divide the files over the processes, rather than the asserts of each file
+        results = verify_files(filenames, jobs=args.jobs, **options)
+
+    for result in results:
+        if result.status == "error":
+            print(f"Could not verify {result.filename}:")
+        if result.output:
+            print("\n".join(result.output))
+        if args.profile:
+            print("\n".join(result.profile.format_table(result.filename)))
+    if args.json:
+        with open(args.json, "w") as file:
+            write_json(results, file)
+    if args.junit:
+        with open(args.junit, "w") as file:
+            write_junit(results, file)
+    return 0 if all(result.status == "ok" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
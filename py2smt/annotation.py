@@ -1,21 +1,30 @@
-import functools
-from unittest import mock
+"""
+    The annotations used in verified programs. At runtime they do nothing, so
+    this module imports nothing and the decorators return the function itself.
+"""
 
-_param = mock.MagicMock()
-_param.__gt__ = mock.Mock()
-_param.__lt__ = mock.Mock()
-_param.__le__ = mock.Mock()
-_param.__ge__ = mock.Mock()
 
+class _Placeholder:
+    """Stands in for parameters and return values in contracts, which are only
+    evaluated when the decorators are applied. Any operation on it gives itself"""
 
-class _ParamImpl:
-    def __getattr__(self, name):
-        return _param
+    def _self(self, *args, **kwargs):
+        return self
 
+    __getattr__ = __call__ = _self
+    __lt__ = __le__ = __gt__ = __ge__ = __eq__ = __ne__ = _self
+    __add__ = __radd__ = __sub__ = __rsub__ = __mul__ = __rmul__ = _self
+    __truediv__ = __rtruediv__ = __floordiv__ = __rfloordiv__ = _self
+    __mod__ = __rmod__ = __neg__ = __pos__ = __invert__ = _self
+    __hash__ = object.__hash__
 
-param = _ParamImpl()
+    def __bool__(self):
+        return True
 
-__return__ = _param
+
+param = _Placeholder()
+
+__return__ = _Placeholder()
 
 
 def __old__(*args, **kwargs):
@@ -23,7 +32,6 @@ def __old__(*args, **kwargs):
 
 
 def assumes(*args):
-    @functools.wraps
     def inner(function):
         return function
 
@@ -31,7 +39,6 @@ def assumes(*args):
 
 
 def ensures(*args):
-    @functools.wraps
     def inner(function):
         return function
 
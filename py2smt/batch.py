@@ -0,0 +1,168 @@
+"""
+    Verification of many files, divided over a pool of worker processes, and
+    machine-readable summaries of the results
+"""
+import json
+import os
+import time
+import traceback
+import typing
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from py2smt.check import check_inner
+from py2smt.profile import Profile
+from py2smt.report import failure_records, format_counterexample
+
+
+@dataclass
+class FileResult:
+    filename: str
+    # "ok", "failed", "unknown" if the solver could not decide some asserts
+    # within its limits but none fail, or "error" if the file could not be checked
+    status: str
+    seconds: float
+    # The lines `python -m py2smt` prints for the file, or the error
+    output: typing.List[str] = field(default_factory=list)
+    # The failures as given by `failure_records`
+    failures: typing.List[dict] = field(default_factory=list)
+    profile: Profile = field(default_factory=Profile)
+
+
+def collect_files(paths: typing.Iterable[str]) -> typing.List[str]:
+    """The files in `paths`, where directories are replaced by the python files
+    in them, recursively and in sorted order"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(str(file) for file in Path(path).rglob("*.py")))
+        else:
+            files.append(path)
+    return files
+
+
+def verify_source(
+    source: str,
+    filename: str = "<input>",
+    smt_output: typing.Optional[typing.TextIO] = None,
+    **options,
+) -> FileResult:
+    """Check the program in `source`, reporting failures and errors in the result
+    rather than raising them. `options` are the fields of `CheckOptions`"""
+    profile = Profile()
+    start = time.perf_counter()
+    try:
+        _, error = check_inner(
+            source, smt_output=smt_output, profile=profile, **options
+        )
+    except Exception as exc:
+        lines = traceback.format_exception_only(type(exc), exc)
+        return FileResult(
+            filename,
+            "error",
+            time.perf_counter() - start,
+            output=[line.rstrip("\n") for line in lines],
+            profile=profile,
+        )
+    seconds = time.perf_counter() - start
+    if error is None:
+        return FileResult(filename, "ok", seconds, profile=profile)
+    failures = failure_records(source, error)
+    failed = any(failure["verdict"] == "failed" for failure in failures)
+    return FileResult(
+        filename,
+        "failed" if failed else "unknown",
+        seconds,
+        output=format_counterexample(filename, source, error),
+        failures=failures,
+        profile=profile,
+    )
+
+
+def verify_file(filename: str, **options) -> FileResult:
+    try:
+        with open(filename, "r") as file:
+            source = file.read()
+    except OSError as exc:
+        return FileResult(filename, "error", 0.0, output=[str(exc)])
+    return verify_source(source, filename, **options)
+
+
+def _verify_file(filename: str, options: dict) -> FileResult:
+    return verify_file(filename, **options)
+
+
+def verify_files(
+    filenames: typing.Sequence[str], jobs: int = 1, **options
+) -> typing.List[FileResult]:
+    """Verify `filenames`, divided over `jobs` worker processes. The results are
+    in the order of `filenames`. `options` are the fields of `CheckOptions`, and
+    every file is checked in a single process"""
+    jobs = min(jobs, len(filenames))
+    if jobs <= 1:
+        return [verify_file(filename, **options) for filename in filenames]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_verify_file, filenames, [options] * len(filenames)))
+
+
+def summary(results: typing.Sequence[FileResult]) -> typing.Dict[str, typing.Any]:
+    counts = {status: 0 for status in ("ok", "failed", "unknown", "error")}
+    for result in results:
+        counts[result.status] += 1
+    return {
+        "files": len(results),
+        **counts,
+        "seconds": sum(result.seconds for result in results),
+    }
+
+
+def write_json(results: typing.Sequence[FileResult], stream: typing.TextIO):
+    """Write the results, with the time spent in each phase of every file, and
+    their summary as JSON"""
+    files = [
+        {
+            "filename": result.filename,
+            "status": result.status,
+            "seconds": result.seconds,
+            "phases": result.profile.phases,
+            "failures": result.failures,
+            "output": result.output,
+        }
+        for result in results
+    ]
+    json.dump({"files": files, "summary": summary(results)}, stream, indent=2)
+    stream.write("\n")
+
+
+def write_junit(results: typing.Sequence[FileResult], stream: typing.TextIO):
+    """Write the results as JUnit XML, with one test case per file"""
+    counts = summary(results)
+    attributes = {
+        "name": "py2smt",
+        "tests": str(counts["files"]),
+        "failures": str(counts["failed"] + counts["unknown"]),
+        "errors": str(counts["error"]),
+        "time": f"{counts['seconds']:.6f}",
+    }
+    suites = ET.Element("testsuites", attributes)
+    suite = ET.SubElement(suites, "testsuite", attributes)
+    for result in results:
+        case = ET.SubElement(
+            suite,
+            "testcase",
+            {
+                "classname": "py2smt",
+                "name": result.filename,
+                "time": f"{result.seconds:.6f}",
+            },
+        )
+        if result.status in ("failed", "unknown"):
+            failure = ET.SubElement(case, "failure", {"message": result.output[0]})
+            failure.text = "\n".join(result.output)
+        elif result.status == "error":
+            error = ET.SubElement(case, "error", {"message": result.output[-1]})
+            error.text = "\n".join(result.output)
+    ET.ElementTree(suites).write(stream, encoding="unicode", xml_declaration=True)
+    stream.write("\n")
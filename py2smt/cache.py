@@ -0,0 +1,167 @@
+"""
+    On-disk caches, used to avoid re-verifying parts of a program that did not
+    change between runs
+"""
+import dataclasses
+import enum
+import hashlib
+import json
+import os
+import typing
+from pathlib import Path
+
+# Bump when lowering changes in a way that affects what a cached entry means
+CACHE_VERSION = 1
+
+
+def _stable_repr(value) -> typing.Any:
+    """JSON-able representation of an IR (sub)tree, without `ast` back-references"""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return [
+            type(value).__name__,
+            *(
+                _stable_repr(getattr(value, f.name))
+                for f in dataclasses.fields(value)
+                if f.compare
+            ),
+        ]
+    elif isinstance(value, (list, tuple)):
+        return [_stable_repr(v) for v in value]
+    elif isinstance(value, dict):
+        return {str(k): _stable_repr(v) for k, v in value.items()}
+    elif isinstance(value, enum.Enum):
+        return value.name
+    elif isinstance(value, type):
+        return value.__name__
+    return value
+
+
+def stable_hash(*values) -> str:
+    """Hash of IR nodes that is stable across runs and python processes"""
+    data = json.dumps([CACHE_VERSION, *map(_stable_repr, values)], default=repr)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class DiskCache:
+    """Key-value store of JSON values with one file per entry.
+    Holds at most `max_entries`, evicting the least recently used entries."""
+
+    def __init__(self, directory: str | os.PathLike, max_entries: int = 4096):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        # Number of entries, counted on the first write. Other processes may
+        # add entries too, so it is a lower bound, corrected by `evict`
+        self._entries: typing.Optional[int] = None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key
+
+    def _scan(self) -> typing.List[os.DirEntry]:
+        return [entry for entry in os.scandir(self.directory) if entry.name.isalnum()]
+
+    def get(self, key: str, default=None):
+        path = self._path(key)
+        try:
+            value = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return default
+        # Mark as recently used
+        os.utime(path)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, default=self) is not self
+
+    def put(self, key: str, value):
+        self.put_many({key: value})
+
+    def put_many(self, items: typing.Mapping[str, typing.Any]):
+        """Store all `items`, evicting once after writing them"""
+        if not items:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self._entries is None:
+            self._entries = len(self._scan())
+        for key, value in items.items():
+            path = self._path(key)
+            if not path.exists():
+                self._entries += 1
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(value))
+            tmp.replace(path)
+        if self._entries > self.max_entries:
+            self.evict()
+
+    def evict(self):
+        entries = self._scan()
+        self._entries = len(entries)
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[: len(entries) - self.max_entries]:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                # Evicted concurrently
+                pass
+        self._entries = self.max_entries
+
+
+class FunctionCache:
+    """Remembers which functions were verified, keyed by a hash of the function's
+    HIR and the contracts of the functions it calls"""
+
+    def __init__(self, directory: str | os.PathLike, max_entries: int = 4096):
+        self.store = DiskCache(Path(directory) / "functions", max_entries)
+
+    @staticmethod
+    def key(funcdef, callee_contracts) -> str:
+        return stable_hash(funcdef, callee_contracts)
+
+    def is_verified(self, key: str) -> bool:
+        return key in self.store
+
+    def mark_verified(self, key: str):
+        self.store.put(key, True)
+
+
+class StatementCache:
+    """Remembers which top-level statements of a module were verified. The key of
+    a statement is a hash of its HIR and the key of the statement before it, so
+    it covers all statements before it, where functions only count with their
+    contracts"""
+
+    def __init__(self, directory: str | os.PathLike, max_entries: int = 4096):
+        self.store = DiskCache(Path(directory) / "statements", max_entries)
+
+    @staticmethod
+    def key(previous: typing.Optional[str], stmt) -> str:
+        return stable_hash(previous, stmt)
+
+    def is_verified(self, key: str) -> bool:
+        return key in self.store
+
+    def mark_verified(self, key: str):
+        self.store.put(key, True)
+
+    def mark_all_verified(self, keys: typing.Iterable[str]):
+        self.store.put_many(dict.fromkeys(keys, True))
+
+
+class VerdictCache:
+    """Remembers the definitive verdicts of the solver, `"sat"` or `"unsat"`,
+    keyed by the digest of the canonical form of the query and the solver that
+    decided it"""
+
+    def __init__(self, directory: str | os.PathLike, max_entries: int = 4096):
+        self.store = DiskCache(Path(directory) / "verdicts", max_entries)
+
+    @staticmethod
+    def key(digest: str, **solver) -> str:
+        return stable_hash(digest, solver)
+
+    def get(self, key: str) -> typing.Optional[str]:
+        return self.store.get(key)
+
+    def put(self, key: str, verdict: str):
+        self.store.put(key, verdict)
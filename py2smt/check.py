@@ -1,8 +1,18 @@
 import ast
+import bisect
+import io
+import multiprocessing
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from fractions import Fraction
 
 import z3  # type: ignore
 
-from py2smt import hir, lir, mir
+from py2smt import hir, lir, mir, portfolio
+from py2smt.cache import FunctionCache, StatementCache, VerdictCache
+from py2smt.profile import Profile
 
 
 class CheckFailed(Exception):
@@ -11,60 +21,709 @@ class CheckFailed(Exception):
         self.context = context
 
 
-def check_inner(text: str):
-    syntax = ast.parse(text)
-    hir_ = hir.lower_ast_to_hir(syntax)
-    mir_ = mir.lower_hir_to_mir(hir_)
-    lir_ = lir.lower_mir_to_lir(mir_)
+class CheckFailures(CheckFailed):
+    """Raised when checking for all failures. Behaves like the first failure,
+    but holds all of them in `failures`"""
 
-    smt_strs = []
-    decls = {}
-    decls_orig = {}
-    for decl in lir_.function_defs:
-        ident = decl.ident.ident
-        decls[ident] = z3.Function(ident, *decl.args, decl.sort)
-        decls_orig[ident] = decl
-        smt_strs.append(decl.to_smt())
+    def __init__(self, failures: typing.List[CheckFailed]):
+        super().__init__(failures[0].model, failures[0].context)
+        self.failures = failures
 
-    solver = z3.SimpleSolver()
-    error = None
 
-    for stmt in lir_.body:
-        smt_strs.append(stmt.to_smt())
-        if isinstance(stmt, lir.ValidityScope):  # or isinstance(stmt, lir.Scope):
-            solver.push()
-            if isinstance(stmt, lir.ValidityScope):
-                assumptions = z3.parse_smt2_string(
-                    "".join(a.to_smt() for a in stmt.assumptions), decls=decls
+class CheckUnknown(CheckFailed):
+    """Raised when the solver cannot decide a validity scope, e.g. because it
+    timed out. The model is empty and `reason` is the reason the solver gave"""
+
+    def __init__(self, context, reason: str):
+        super().__init__([], context)
+        self.reason = reason
+
+
+@dataclass
+class CheckOptions:
+    # Number of worker processes to divide the validity scopes over
+    jobs: int = 1
+    # Cache of verified functions, which are then not verified again
+    cache: typing.Optional[FunctionCache] = None
+    # Cache of verified top-level statements, whose asserts are then not solved
+    # again
+    statement_cache: typing.Optional[StatementCache] = None
+    # Cache of the verdicts of the solver by the canonical form of the query,
+    # so the same query is not solved again, in this program or another
+    verdict_cache: typing.Optional[VerdictCache] = None
+    # Stop solving at the first failure
+    fail_fast: bool = False
+    # Report all failures in a `CheckFailures` instead of only the first
+    all_failures: bool = False
+    # Propagate and fold constants before lowering to LIR
+    optimize: bool = True
+    # Solve each validity scope with only the assumptions it depends on
+    slice: bool = False
+    # Seconds the solver may spend on each validity scope
+    timeout: typing.Optional[float] = None
+    # Seconds the solver may spend on all validity scopes together
+    budget: typing.Optional[float] = None
+    # Megabytes of memory the solver may use
+    max_memory: typing.Optional[int] = None
+    # Solver strategies to solve each validity scope with, as `name` or
+    # `name:seconds`, see `portfolio.STRATEGIES`
+    portfolio: typing.Optional[typing.List[str]] = None
+    # Try the strategies in order, instead of racing them
+    escalate: bool = False
+    # Check each validity scope assuming a literal of its own instead of in a
+    # pushed scope, see `lir.assumption_literals`
+    assumption_literals: bool = False
+
+
+@dataclass
+class SolverLimits:
+    # Seconds the solver may spend on each query
+    timeout: typing.Optional[float] = None
+    # `time.monotonic()` after which no more queries are started. The monotonic
+    # clock is shared by processes, so it also holds for worker processes
+    deadline: typing.Optional[float] = None
+    # Megabytes of memory the solver may use
+    max_memory: typing.Optional[int] = None
+
+    def new_solver(self, logic: typing.Optional[str] = None) -> z3.Solver:
+        """A solver for `logic`, or for any logic"""
+        solver = z3.SimpleSolver() if logic is None else z3.SolverFor(logic)
+        if self.max_memory is not None:
+            solver.set("max_memory", self.max_memory)
+        return solver
+
+    def query_timeout(self) -> typing.Optional[float]:
+        """Seconds the next query may take, or None if it is not limited"""
+        timeout = self.timeout
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+
+def lower(
+    text: str,
+    cache: typing.Optional[FunctionCache] = None,
+    profile: typing.Optional[Profile] = None,
+    optimize: bool = True,
+    statement_cache: typing.Optional[StatementCache] = None,
+) -> typing.Tuple[mir.Module, lir.Model]:
+    profile = profile or Profile()
+    with profile.phase("parse"):
+        syntax = ast.parse(text)
+    with profile.phase("lower_ast_to_hir"):
+        hir_ = hir.lower_ast_to_hir(syntax)
+    with profile.phase("lower_hir_to_mir"):
+        mir_ = mir.lower_hir_to_mir(hir_, cache, statement_cache)
+    if optimize:
+        with profile.phase("optimize_mir"):
+            mir_ = mir.optimize_mir(mir_)
+    with profile.phase("lower_mir_to_lir"):
+        lir_ = lir.lower_mir_to_lir(mir_)
+    with profile.phase("share_subterms"):
+        lir_ = lir.share_subterms(lir_)
+    with profile.phase("infer_logic"):
+        lir_ = lir.infer_logic(lir_)
+    return mir_, lir_
+
+
+def model_value(value: z3.ExprRef):
+    """Convert a value from a z3 model to the equivalent python value"""
+    if z3.is_true(value) or z3.is_false(value):
+        return z3.is_true(value)
+    elif z3.is_int_value(value):
+        return value.as_long()
+    elif z3.is_rational_value(value):
+        return Fraction(value.numerator_as_long(), value.denominator_as_long())
+    return value
+
+
+def validity_scopes(model: lir.Model) -> typing.List[lir.ValidityScope]:
+    return [stmt for stmt in model.body if isinstance(stmt, lir.ValidityScope)]
+
+
+def _statement_key(
+    module: mir.Module, scope: lir.ValidityScope
+) -> typing.Optional[str]:
+    """The `StatementCache` key of the top-level statement that `scope` is part
+    of, if it is a module-level validity scope with a known location"""
+    if scope.ctx_name != "__main__" or scope.ast_node is None:
+        return None
+    lineno = scope.ast_node.lineno
+    # Statements on the same lines, like `a = b = 1`, are lowered to several
+    # statements, of which the last one has the key covering all of them
+    idx = bisect.bisect_right(module.statement_keys, lineno, key=lambda key: key[0])
+    if idx == 0:
+        return None
+    _, last, key = module.statement_keys[idx - 1]
+    return key if lineno <= last else None
+
+
+def _verified_scopes(
+    module: mir.Module,
+    scopes: typing.List[lir.ValidityScope],
+    statement_cache: typing.Optional[StatementCache],
+) -> typing.Set[int]:
+    """Indices of the validity scopes whose top-level statement was verified"""
+    if statement_cache is None:
+        return set()
+    verified = set()
+    for idx, scope in enumerate(scopes):
+        key = _statement_key(module, scope)
+        if key is not None and statement_cache.is_verified(key):
+            verified.add(idx)
+    return verified
+
+
+def _solve_scope(
+    solver: z3.Solver,
+    env: lir.Z3Env,
+    idx: int,
+    scope: lir.ValidityScope,
+    profile: Profile,
+    limits: SolverLimits,
+    logic: typing.Optional[str] = None,
+    verdicts: typing.Optional[VerdictCache] = None,
+    key: typing.Optional[str] = None,
+) -> typing.Union[typing.List, str, None]:
+    """Check the validity scope with index `idx` against the assumptions in
+    `solver`, returning the counterexample if it fails, or the reason if the
+    solver cannot decide it. `logic` is the logic of the query, for `profile`.
+
+    With `verdicts`, a query whose `key` is cached as unsat is proven without
+    calling the solver, and the verdict of a query the solver decides is
+    cached"""
+    if isinstance(scope.test, lir.Constant) and scope.test.value is True:
+        profile.add_query(idx, scope, "proven", 0.0, logic=logic)
+        return None
+    cached = _cached_verdict(verdicts, key)
+    if cached == "unsat":
+        profile.add_query(idx, scope, "cached", 0.0, logic=logic)
+        return None
+    timeout = limits.query_timeout()
+    if timeout is not None and timeout <= 0:
+        profile.add_query(idx, scope, "unknown", 0.0, logic=logic)
+        return "budget exhausted" if cached is None else []
+
+    start = time.perf_counter()
+    result, outcome = _check_scope(solver, env, scope, timeout)
+    profile.add_query(idx, scope, result, time.perf_counter() - start, logic=logic)
+    return _store_verdict(verdicts, key, cached, result, outcome)
+
+
+def _cached_verdict(
+    verdicts: typing.Optional[VerdictCache], key: typing.Optional[str]
+) -> typing.Optional[str]:
+    if verdicts is None or key is None:
+        return None
+    return verdicts.get(key)
+
+
+def _store_verdict(
+    verdicts: typing.Optional[VerdictCache],
+    key: typing.Optional[str],
+    cached: typing.Optional[str],
+    result: str,
+    outcome: typing.Union[typing.List, str, None],
+) -> typing.Union[typing.List, str, None]:
+    """Cache a definitive `result` and return the `outcome` of the query. A query
+    cached as sat was only solved again for its counterexample, and fails without
+    one if the solver cannot decide it this time"""
+    if verdicts is not None and key is not None and result in ("sat", "unsat"):
+        verdicts.put(key, result)
+    if cached == "sat" and isinstance(outcome, str):
+        return []
+    return outcome
+
+
+def _verdict_key(verdicts: VerdictCache, digest: str, **solver) -> str:
+    """The key of the query with `digest` for the solver configured by `solver`,
+    which includes the version of z3"""
+    return verdicts.key(digest, z3=z3.get_full_version(), **solver)
+
+
+def _check_scope(
+    solver: z3.Solver,
+    env: lir.Z3Env,
+    scope: lir.ValidityScope,
+    timeout: typing.Optional[float],
+) -> typing.Tuple[str, typing.Union[typing.List, str, None]]:
+    """Check `scope` against the assumptions in `solver`, returning the result
+    and the counterexample or the reason it is unknown. A scope with a literal
+    is checked assuming it, and the literal is false afterwards"""
+    outcome: typing.Union[typing.List, str, None] = None
+    if timeout is not None:
+        solver.set("timeout", max(1, int(timeout * 1000)))
+    if scope.literal is None:
+        solver.push()
+        solver.add(*(a.to_z3(env) for a in scope.assumptions))
+        solver.add(z3.Not(scope.test.to_z3(env)))
+        result = solver.check()
+    else:
+        literal = z3.Bool(scope.literal)
+        solver.add(scope.to_z3_guarded(env))
+        result = solver.check(literal)
+    if result == z3.sat:
+        z3_model = solver.model()
+        outcome = [
+            (model_value(z3_model.get_interp(decl)), decl.name())
+            for decl in z3_model.decls()
+            # Leaves out the literals of validity scopes, and terms that are
+            # defined in z3's context by parsing SMT-LIB, as in the tests
+            if decl.name() in env.function_defs
+        ]
+    elif result == z3.unknown:
+        # z3 gives "canceled" when it hits the timeout
+        reason = solver.reason_unknown()
+        outcome = "timeout" if reason == "canceled" else reason
+    if scope.literal is None:
+        solver.pop()
+    else:
+        solver.add(z3.Not(literal))
+    return str(result), outcome
+
+
+def _solve_portfolio_scope(
+    query: lir.Query,
+    strategies: typing.List[portfolio.Strategy],
+    escalate: bool,
+    profile: Profile,
+    limits: SolverLimits,
+    verdicts: typing.Optional[VerdictCache] = None,
+    key: typing.Optional[str] = None,
+) -> typing.Union[typing.List, str, None]:
+    """Like `_solve_scope`, but solves the query with each of the `strategies`,
+    racing them or escalating through them in order. Records which strategy
+    decided the query in `profile`"""
+    scope, logic = query.scope, query.logic
+    if isinstance(scope.test, lir.Constant) and scope.test.value is True:
+        profile.add_query(query.index, scope, "proven", 0.0, logic=logic)
+        return None
+    cached = _cached_verdict(verdicts, key)
+    if cached == "unsat":
+        profile.add_query(query.index, scope, "cached", 0.0, logic=logic)
+        return None
+    timeout = limits.query_timeout()
+    if timeout is not None and timeout <= 0:
+        profile.add_query(query.index, scope, "unknown", 0.0, logic=logic)
+        return "budget exhausted" if cached is None else []
+
+    def attempt(strategy: portfolio.Strategy):
+        def run():
+            solver = strategy.new_solver(limits.max_memory)
+            env = lir.Z3Env(query.function_defs, query.templates)
+            solver.add(*(a.to_z3(env) for a in query.assumptions))
+            result, outcome = _check_scope(
+                solver, env, scope, strategy.query_timeout(timeout)
+            )
+            if isinstance(outcome, list):
+                # Values are sent between processes, which z3 values cannot be
+                outcome = [
+                    (
+                        (
+                            value
+                            if isinstance(value, (bool, int, Fraction))
+                            else str(value)
+                        ),
+                        ident,
+                    )
+                    for value, ident in outcome
+                ]
+            return result, outcome
+
+        return run
+
+    start = time.perf_counter()
+    run = portfolio.escalate if escalate else portfolio.race
+    winner, results = run([attempt(strategy) for strategy in strategies])
+    seconds = time.perf_counter() - start
+    if winner is None:
+        profile.add_query(query.index, scope, "unknown", seconds, logic=logic)
+        reason = ", ".join(
+            f"{strategies[idx].name}: {outcome}"
+            for idx, (_, outcome) in sorted(results.items())
+        )
+        return _store_verdict(verdicts, key, cached, "unknown", reason)
+    result, outcome = results[winner]
+    profile.add_query(
+        query.index,
+        scope,
+        result,
+        seconds,
+        strategy=strategies[winner].name,
+        logic=logic,
+    )
+    return _store_verdict(verdicts, key, cached, result, outcome)
+
+
+def _report_failure(first_failure, idx: int):
+    if first_failure is not None:
+        with first_failure.get_lock():
+            first_failure.value = min(first_failure.value, idx)
+
+
+def solve(
+    model: lir.Model,
+    selected: typing.Optional[typing.Container[int]] = None,
+    fail_fast: bool = False,
+    first_failure=None,
+    profile: typing.Optional[Profile] = None,
+    limits: typing.Optional[SolverLimits] = None,
+    verdicts: typing.Optional[VerdictCache] = None,
+) -> typing.Tuple[z3.Solver, typing.List[typing.Tuple[int, typing.Any]]]:
+    """Solve the validity scopes of `model`, or only those whose index is in
+    `selected`. Returns the solver and the failures as pairs of the index of the
+    failing validity scope and the counterexample, as `(value, ident)` pairs.
+    Validity scopes the solver cannot decide within the `limits` are failures
+    with the reason as a string instead of a counterexample.
+
+    With `fail_fast`, solving stops at the first failure with a counterexample.
+    `first_failure` is a shared `multiprocessing.Value` with the lowest index of
+    such a failure found by any process, so fail-fast workers skip validity
+    scopes after it.
+
+    Validity scopes whose test is the constant `true` are proven without calling
+    the solver, and so are those whose query is cached as unsat in `verdicts`.
+    The time taken by each query is added to `profile`."""
+    profile = profile or Profile()
+    limits = limits or SolverLimits()
+    env = lir.Z3Env(model.function_defs, model.templates)
+    # z3 solves incrementally with its general solver whatever the logic, and
+    # the solver for a logic only adds overhead then
+    solver = limits.new_solver()
+    failures = []
+    canonicalizer = None
+    if verdicts is not None:
+        canonicalizer = lir.Canonicalizer(model.function_defs, model.templates)
+
+    idx = -1
+    for stmt in model.body:
+        if isinstance(stmt, lir.ValidityScope):
+            idx += 1
+            if first_failure is not None and idx > first_failure.value:
+                break
+            if selected is None or idx in selected:
+                key = None
+                if verdicts is not None and canonicalizer is not None:
+                    key = _verdict_key(
+                        verdicts, canonicalizer.scope_digest(stmt), solver="simple"
+                    )
+                outcome = _solve_scope(
+                    solver, env, idx, stmt, profile, limits, model.logic, verdicts, key
                 )
-                test_str = f"(assert (not {stmt.test.to_smt()}))"
-                test = z3.parse_smt2_string(test_str, decls=decls)
-                solver.add(test)
-            else:
-                assumptions = z3.parse_smt2_string(
-                    "".join(a.to_smt() for a in stmt.stmts if a)
+                if outcome is not None:
+                    failures.append((idx, outcome))
+                    if fail_fast and not isinstance(outcome, str):
+                        _report_failure(first_failure, idx)
+                        break
+            solver.add(*(a.to_z3(env) for a in stmt.post))
+            if canonicalizer is not None:
+                for assumption in stmt.post:
+                    canonicalizer.assume(assumption)
+        else:
+            solver.add(stmt.to_z3(env))
+            if canonicalizer is not None:
+                canonicalizer.assume(stmt)
+    return solver, failures
+
+
+def solve_queries(
+    queries: typing.Iterable[lir.Query],
+    fail_fast: bool = False,
+    first_failure=None,
+    profile: typing.Optional[Profile] = None,
+    limits: typing.Optional[SolverLimits] = None,
+    strategies: typing.Optional[typing.List[portfolio.Strategy]] = None,
+    escalate: bool = False,
+    verdicts: typing.Optional[VerdictCache] = None,
+) -> typing.List[typing.Tuple[int, typing.Any]]:
+    """Like `solve`, but solves each of the `queries` with its own solver, which
+    only knows the assumptions in the query and is configured for its logic.
+
+    With `strategies`, every query is solved with that portfolio of solver
+    strategies, racing them in separate processes, or trying them in order with
+    `escalate`"""
+    profile = profile or Profile()
+    limits = limits or SolverLimits()
+    failures = []
+    for query in queries:
+        if first_failure is not None and query.index > first_failure.value:
+            break
+        key = None
+        if verdicts is not None:
+            solver_name = (
+                [strategy.name for strategy in strategies] if strategies else "simple"
+            )
+            key = _verdict_key(
+                verdicts,
+                lir.query_digest(query),
+                solver=solver_name,
+                escalate=escalate,
+                logic=query.logic,
+            )
+        if strategies:
+            outcome = _solve_portfolio_scope(
+                query, strategies, escalate, profile, limits, verdicts, key
+            )
+        else:
+            env = lir.Z3Env(query.function_defs, query.templates)
+            solver = limits.new_solver(query.logic)
+            solver.add(*(a.to_z3(env) for a in query.assumptions))
+            outcome = _solve_scope(
+                solver,
+                env,
+                query.index,
+                query.scope,
+                profile,
+                limits,
+                query.logic,
+                verdicts,
+                key,
+            )
+        if outcome is not None:
+            failures.append((query.index, outcome))
+            if fail_fast and not isinstance(outcome, str):
+                _report_failure(first_failure, query.index)
+                break
+    return failures
+
+
+def _strategies(
+    options: CheckOptions,
+) -> typing.Optional[typing.List[portfolio.Strategy]]:
+    if not options.portfolio:
+        return None
+    return portfolio.parse_strategies(options.portfolio)
+
+
+_first_failure = None
+
+
+def _init_worker(first_failure):
+    global _first_failure
+    _first_failure = first_failure
+
+
+def _solve_share(text: str, options: CheckOptions, limits: SolverLimits, worker: int):
+    """Lower `text` and solve every `jobs`th validity scope, starting at `worker`.
+    Returns the failures and the timings of the queries"""
+    module, model = lower(
+        text,
+        options.cache,
+        optimize=options.optimize,
+        statement_cache=options.statement_cache,
+    )
+    if options.assumption_literals:
+        lir.assumption_literals(model)
+    scopes = validity_scopes(model)
+    verified = _verified_scopes(module, scopes, options.statement_cache)
+    selected = [
+        idx for idx in range(worker, len(scopes), options.jobs) if idx not in verified
+    ]
+    first_failure = _first_failure if options.fail_fast else None
+    profile = Profile()
+    if options.slice or options.portfolio:
+        queries = lir.DependencyIndex(model).queries(selected, sliced=options.slice)
+        failures = solve_queries(
+            queries,
+            options.fail_fast,
+            first_failure,
+            profile=profile,
+            limits=limits,
+            strategies=_strategies(options),
+            escalate=options.escalate,
+            verdicts=options.verdict_cache,
+        )
+    else:
+        _, failures = solve(
+            model,
+            selected=selected,
+            fail_fast=options.fail_fast,
+            first_failure=first_failure,
+            profile=profile,
+            limits=limits,
+            verdicts=options.verdict_cache,
+        )
+    return failures, profile.queries
+
+
+def check_inner(
+    text: str,
+    smt_output: typing.Optional[typing.TextIO] = None,
+    profile: typing.Optional[Profile] = None,
+    **options,
+):
+    """Check the program in `text`, returning the solver and the first failing
+    check in program order, if any. `options` are the fields of `CheckOptions`.
+
+    If `smt_output` is given, the SMT-LIB rendering of the program is written to
+    it as it is generated.
+
+    The time taken by each phase and each query is recorded in `profile`.
+
+    With `fail_fast`, solving stops at the first failure. With `all_failures`,
+    all failures are returned in a `CheckFailures`.
+
+    The solver gets `timeout` seconds for each validity scope, `budget` seconds
+    for all of them together and `max_memory` megabytes. Validity scopes it
+    cannot decide within these limits are reported as a `CheckUnknown`, and
+    solving continues with the next one.
+
+    With `jobs` > 1, the validity scopes are divided over a pool of `jobs` worker
+    processes, which each rebuild the solver context they need. No solver is
+    returned in that case.
+
+    With `assumption_literals`, each validity scope is checked assuming a literal
+    that guards it, rather than in a pushed scope that is popped afterwards, so
+    the solver keeps the lemmas it learned. The SMT-LIB rendering then uses
+    `check-sat-assuming`.
+
+    With `slice`, each validity scope is solved with a fresh solver that only
+    knows the assumptions it depends on. No solver is returned in that case either.
+
+    With a `portfolio` of solver strategies, each validity scope is solved by
+    racing the strategies in separate processes, or by trying them in order with
+    `escalate`, on its own query. No solver is returned in that case either. The
+    strategy that decided each query is recorded in `profile`.
+
+    With a `cache`, functions that were verified before are not verified again
+    and functions that are verified by this check are added to it. Likewise,
+    with a `statement_cache`, the module-level asserts of top-level statements
+    that were verified before, after the same statements and function contracts,
+    are not solved again. With a `verdict_cache`, queries that were decided
+    before, up to the names of identifiers, are not solved again unless they
+    failed, in which case they are solved for their counterexample."""
+    opts = CheckOptions(**options)
+    cache, fail_fast = opts.cache, opts.fail_fast
+    strategies = _strategies(opts)
+    profile = profile if profile is not None else Profile()
+    mir_, lir_ = lower(text, cache, profile, opts.optimize, opts.statement_cache)
+    if opts.assumption_literals:
+        lir.assumption_literals(lir_)
+
+    if smt_output is not None:
+        with profile.phase("smt"):
+            lir.write_smt(lir_, smt_output)
+
+    scopes = validity_scopes(lir_)
+    opts.jobs = min(opts.jobs, len(scopes))
+    verified = _verified_scopes(mir_, scopes, opts.statement_cache)
+    selected = None
+    if verified:
+        selected = [idx for idx in range(len(scopes)) if idx not in verified]
+    with profile.phase("solve"):
+        limits = SolverLimits(timeout=opts.timeout, max_memory=opts.max_memory)
+        if opts.budget is not None:
+            limits.deadline = time.monotonic() + opts.budget
+        if opts.jobs > 1:
+            solver = None
+            first_failure = multiprocessing.Value("i", len(scopes))
+            with ProcessPoolExecutor(
+                max_workers=opts.jobs,
+                initializer=_init_worker,
+                initargs=(first_failure,),
+            ) as pool:
+                shares = list(
+                    pool.map(
+                        _solve_share,
+                        [text] * opts.jobs,
+                        [opts] * opts.jobs,
+                        [limits] * opts.jobs,
+                        range(opts.jobs),
+                    )
                 )
-            if solver.check(*assumptions) != z3.unsat:
-                model = solver.model()
-                print(model)
-                tuples = [
-                    (model.get_interp(decl), decls_orig[decl.name()])
-                    for decl in model.decls()
-                ]
-                error = CheckFailed(tuples, stmt)
-            solver.pop()
+            failures = [failure for share, _ in shares for failure in share]
+            failures.sort(key=lambda failure: failure[0])
+            profile.queries.extend(query for _, queries in shares for query in queries)
+            profile.queries.sort(key=lambda query: query.index)
+        elif opts.slice or strategies:
+            solver = None
+            queries = lir.DependencyIndex(lir_).queries(selected, sliced=opts.slice)
+            failures = solve_queries(
+                queries,
+                fail_fast=fail_fast,
+                profile=profile,
+                limits=limits,
+                strategies=strategies,
+                escalate=opts.escalate,
+                verdicts=opts.verdict_cache,
+            )
         else:
-            parsed = z3.parse_smt2_string(stmt.to_smt(), decls=decls)
-            solver.add(*parsed)
-    return (solver, smt_strs, error)
+            solver, failures = solve(
+                lir_,
+                selected=selected,
+                fail_fast=fail_fast,
+                profile=profile,
+                limits=limits,
+                verdicts=opts.verdict_cache,
+            )
+
+    if cache:
+        failed = {scopes[idx].ctx_name for idx, _ in failures}
+        if fail_fast and failures:
+            # Validity scopes after the first failure were not checked
+            first_idx = failures[0][0]
+            failed.update(scope.ctx_name for scope in scopes[first_idx:])
+        for stmt in mir_.body:
+            if (
+                isinstance(stmt, mir.FuncDef)
+                and not stmt.verified
+                and stmt.name not in failed
+            ):
+                cache.mark_verified(stmt.cache_key)
+
+    if opts.statement_cache:
+        unverified = {_statement_key(mir_, scopes[idx]) for idx, _ in failures}
+        if fail_fast and failures:
+            first_idx = failures[0][0]
+            unverified.update(
+                _statement_key(mir_, scope) for scope in scopes[first_idx:]
+            )
+        # Only the keys of statements with module-level validity scopes are
+        # looked up, and those of the scopes that were skipped are stored already
+        keys = {
+            _statement_key(mir_, scope)
+            for idx, scope in enumerate(scopes)
+            if idx not in verified
+        }
+        opts.statement_cache.mark_all_verified(keys - unverified - {None})
+
+    function_defs = {def_.ident.ident: def_ for def_ in lir_.function_defs}
+    # z3 lists the model in an order that depends on earlier queries in the
+    # process, so order it by declaration for the same report in every process
+    order = {ident: idx for idx, ident in enumerate(function_defs)}
+    errors = [
+        (
+            CheckUnknown(scopes[idx], outcome)
+            if isinstance(outcome, str)
+            else CheckFailed(
+                [
+                    (value, function_defs[ident])
+                    for value, ident in sorted(outcome, key=lambda pair: order[pair[1]])
+                ],
+                scopes[idx],
+            )
+        )
+        for idx, outcome in failures
+    ]
+    error = None
+    if errors:
+        error = CheckFailures(errors) if opts.all_failures else errors[0]
+    return (solver, error)
 
 
-def get_smt(text: str):
-    _, smt_strs, _ = check_inner(text)
-    return smt_strs
+def get_smt(text: str, **options) -> typing.List[str]:
+    """The lines of the SMT-LIB rendering of `text`"""
+    stream = io.StringIO()
+    check_inner(text, smt_output=stream, **options)
+    return stream.getvalue().splitlines()
 
 
-def check(text: str):
-    _, _, error = check_inner(text)
+def check(text: str, profile: typing.Optional[Profile] = None, **options) -> Profile:
+    """Check the program in `text`, raising a `CheckFailed` if it fails.
+    `options` are the fields of `CheckOptions`. Returns the timing profile"""
+    profile = profile if profile is not None else Profile()
+    _, error = check_inner(text, profile=profile, **options)
     if error:
         raise error
+    return profile
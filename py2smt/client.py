@@ -0,0 +1,193 @@
+"""
+    Client for the verification server in `py2smt.daemon`. It only uses the
+    standard library, so it starts without loading z3 or the pipeline.
+    Run with `python -m py2smt.client --socket SOCKET filename`.
+"""
+import argparse
+import json
+import socket
+import sys
+import uuid
+
+
+class Client:
+    def __init__(self, path: str):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.responses = self.socket.makefile("rb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.responses.close()
+        self.socket.close()
+
+    def send(self, request: dict):
+        self.socket.sendall(json.dumps(request).encode() + b"\n")
+
+    def receive(self) -> dict:
+        """The next response from the server, in the order the checks finish"""
+        line = self.responses.readline()
+        if not line:
+            raise ConnectionError("The server closed the connection")
+        return json.loads(line)
+
+    def submit(self, source: str, filename: str = "<input>", **options) -> str:
+        """Start checking `source` with the fields of `CheckOptions` in `options`.
+        Returns the id of the request"""
+        request_id = uuid.uuid4().hex
+        self.send(
+            {
+                "id": request_id,
+                "source": source,
+                "filename": filename,
+                "options": options,
+            }
+        )
+        return request_id
+
+    def cancel(self, request_id: str):
+        self.send({"cancel": request_id})
+
+    def check(self, source: str, filename: str = "<input>", **options) -> dict:
+        """Check `source` and wait for the response"""
+        self.submit(source, filename, **options)
+        return self.receive()
+
+
+def _strategies(value: str):
+    # `py2smt.portfolio` loads z3, so only import it for a portfolio
+    from py2smt.portfolio import strategy_list
+
+    return strategy_list(value)
+
+
+parser = argparse.ArgumentParser(description="Verify a python program with a server")
+parser.add_argument(
+    "--socket",
+    dest="socket",
+    required=True,
+    help="Path of the Unix domain socket the server listens on",
+)
+parser.add_argument(
+    "--jobs",
+    "-j",
+    dest="jobs",
+    type=int,
+    default=1,
+    help="Number of worker processes to divide the assertions over",
+)
+failure_mode = parser.add_mutually_exclusive_group()
+failure_mode.add_argument(
+    "--fail-fast",
+    dest="fail_fast",
+    action="store_true",
+    help="Stop at the first failing assert",
+)
+failure_mode.add_argument(
+    "--all",
+    dest="all_failures",
+    action="store_true",
+    help="Report all failing asserts, each with its own counterexample",
+)
+parser.add_argument(
+    "--no-optimize",
+    dest="optimize",
+    action="store_false",
+    help="Do not propagate and fold constants before solving",
+)
+parser.add_argument(
+    "--slice",
+    dest="slice",
+    action="store_true",
+    help="Solve each assert with only the assumptions it depends on",
+)
+parser.add_argument(
+    "--timeout",
+    dest="timeout",
+    type=float,
+    metavar="SECONDS",
+    help="Seconds the solver may spend on each assert before it is unknown",
+)
+parser.add_argument(
+    "--budget",
+    dest="budget",
+    type=float,
+    metavar="SECONDS",
+    help="Seconds the solver may spend on all asserts of a file together",
+)
+parser.add_argument(
+    "--max-memory",
+    dest="max_memory",
+    type=int,
+    metavar="MB",
+    help="Megabytes of memory the solver may use",
+)
+parser.add_argument(
+    "--portfolio",
+    dest="portfolio",
+    type=_strategies,
+    metavar="STRATEGIES",
+    help="Race the comma-separated solver strategies, given as NAME or "
+    "NAME:SECONDS, on each assert",
+)
+parser.add_argument(
+    "--escalate",
+    dest="escalate",
+    action="store_true",
+    help="Try the strategies of the portfolio in order instead of racing them",
+)
+parser.add_argument(
+    "--assumption-literals",
+    dest="assumption_literals",
+    action="store_true",
+    help="Check each assert assuming a literal instead of in a pushed scope, so "
+    "the solver keeps what it learned",
+)
+parser.add_argument("filename", action="store", type=str)
+
+
+def main(argv):
+    args = parser.parse_args(argv)
+    with open(args.filename, "r") as file:
+        text = file.read()
+
+    with Client(args.socket) as client:
+        request_id = client.submit(
+            text,
+            args.filename,
+            jobs=args.jobs,
+            fail_fast=args.fail_fast,
+            all_failures=args.all_failures,
+            optimize=args.optimize,
+            slice=args.slice,
+            timeout=args.timeout,
+            budget=args.budget,
+            max_memory=args.max_memory,
+            portfolio=args.portfolio,
+            escalate=args.escalate,
+            assumption_literals=args.assumption_literals,
+        )
+        try:
+            response = client.receive()
+        except KeyboardInterrupt:
+            client.cancel(request_id)
+            response = client.receive()
+
+    if response["status"] == "cancelled":
+        print("Cancelled", file=sys.stderr)
+        return 130
+    elif response["status"] == "error":
+        print("\n".join(response["output"]), file=sys.stderr)
+        return 2
+    if response["output"]:
+        print("\n".join(response["output"]))
+    return 0 if response["status"] == "ok" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,257 @@
+"""
+    A long-lived verification server, which keeps z3 and the pipeline loaded
+    between checks. Run with `python -m py2smt.daemon SOCKET`.
+
+    Clients connect to the Unix domain socket and send requests as JSON, one per
+    line. A check names the program and the fields of `CheckOptions` to use:
+
+        {"id": 1, "source": "...", "filename": "a.py", "options": {"all_failures": true}}
+
+    and is answered with a single line, in the order the checks finish:
+
+        {"id": 1, "status": "failed", "output": [...], "failures": [...]}
+
+    `status` is "ok", "failed", "unknown", "cancelled" or "error", and `output` and
+    `failures` are as in `batch.FileResult`. A running check is cancelled, from
+    any connection, with `{"cancel": 1}`. The `id` of a check, a string or an
+    integer, is required, and requests that are not valid are answered with an
+    error.
+
+    Every check runs in its own process, forked from a server process that has
+    already imported the pipeline, so it can be killed when it is cancelled.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socketserver
+import sys
+import threading
+import typing
+from multiprocessing.connection import wait
+
+from py2smt.batch import verify_source
+from py2smt.cache import FunctionCache
+
+# The fields of `CheckOptions` that requests can set
+REQUEST_OPTIONS = {
+    "jobs",
+    "fail_fast",
+    "all_failures",
+    "optimize",
+    "slice",
+    "timeout",
+    "budget",
+    "max_memory",
+    "portfolio",
+    "escalate",
+    "assumption_literals",
+}
+
+# The types of the ids of checks
+ID_TYPES = (str, int)
+
+
+def request_error(request) -> typing.Optional[str]:
+    """Why `request` is not a valid check or cancellation, if it is not"""
+    if not isinstance(request, dict):
+        return "Requests must be JSON objects"
+    if "cancel" in request:
+        if not isinstance(request["cancel"], ID_TYPES):
+            return "The id to `cancel` must be a string or an integer"
+        return None
+    if not isinstance(request.get("id"), ID_TYPES):
+        return "Checks need an `id`, a string or an integer"
+    if not isinstance(request.get("source"), str):
+        return "Checks need a `source`, a string"
+    if not isinstance(request.get("options", {}), dict):
+        return "The `options` of a check must be an object"
+    return None
+
+
+def run_request(request: dict, cache: typing.Optional[FunctionCache] = None):
+    """Check the program in `request`, returning the response without its id"""
+    source = request["source"]
+    options = request.get("options", {})
+    unknown = set(options) - REQUEST_OPTIONS
+    if unknown:
+        return {"status": "error", "output": [f"Unknown options: {sorted(unknown)}"]}
+    result = verify_source(
+        source, request.get("filename", "<input>"), cache=cache, **options
+    )
+    return {
+        "status": result.status,
+        "output": result.output,
+        "failures": result.failures,
+    }
+
+
+def _run_child(request: dict, cache: typing.Optional[FunctionCache], connection):
+    # Cancelling kills the process group, including worker processes for `jobs`
+    os.setpgrp()
+    connection.send(run_request(request, cache))
+    connection.close()
+
+
+class VerificationServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, cache: typing.Optional[FunctionCache] = None):
+        super().__init__(path, _Handler)
+        self.cache = cache
+        # The fork server imports the pipeline once, and every check forks from it
+        self.context = multiprocessing.get_context("forkserver")
+        self.context.set_forkserver_preload(["py2smt.batch"])
+        self.lock = threading.Lock()
+        # The processes of the registered checks, by id, or None if not started
+        self.running: typing.Dict[
+            typing.Any, typing.Optional[multiprocessing.Process]
+        ] = {}
+        self.cancelled: typing.Set[typing.Any] = set()
+
+    def warm_up(self):
+        """Start the fork server and run a check, so the first request does not
+        wait for the imports"""
+        request = {"id": None, "source": "assert True"}
+        self.register(request)
+        self.run(request)
+
+    def register(self, request: dict) -> typing.Optional[dict]:
+        """Register the check in `request`, so it can be cancelled before it is
+        started. Returns an error response if its id is already in use"""
+        request_id = request.get("id")
+        with self.lock:
+            if request_id in self.running:
+                message = f"A check with id {request_id!r} is already running"
+                return {"id": request_id, "status": "error", "output": [message]}
+            self.running[request_id] = None
+        return None
+
+    def run(self, request: dict) -> dict:
+        """Check the program in the registered `request` in a new process and
+        return the response"""
+        request_id = request.get("id")
+        reader, writer = self.context.Pipe(duplex=False)
+        process = self.context.Process(
+            target=_run_child, args=(request, self.cache, writer)
+        )
+        response = None
+        with self.lock:
+            if request_id not in self.cancelled:
+                process.start()
+                self.running[request_id] = process
+        writer.close()
+        if process.pid is not None:
+            wait([reader, process.sentinel])
+            try:
+                response = reader.recv()
+            except EOFError:
+                pass
+            process.join()
+        with self.lock:
+            del self.running[request_id]
+            cancelled = request_id in self.cancelled
+            self.cancelled.discard(request_id)
+
+        if cancelled:
+            response = {"status": "cancelled", "output": []}
+        elif response is None:
+            message = f"Check exited with code {process.exitcode}"
+            response = {"status": "error", "output": [message]}
+        return {"id": request_id, **response}
+
+    def cancel(self, request_id):
+        with self.lock:
+            if request_id not in self.running:
+                return
+            self.cancelled.add(request_id)
+            process = self.running[request_id]
+            if process is None:
+                return
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                # The check has not made its process group yet
+                process.kill()
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except FileNotFoundError:
+            pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.write_lock = threading.Lock()
+        checks = []
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as exc:
+                self.respond({"id": None, "status": "error", "output": [str(exc)]})
+                continue
+            message = request_error(request)
+            if message is not None:
+                request_id = request.get("id") if isinstance(request, dict) else None
+                if not isinstance(request_id, ID_TYPES):
+                    request_id = None
+                self.respond({"id": request_id, "status": "error", "output": [message]})
+                continue
+            if "cancel" in request:
+                self.server.cancel(request["cancel"])
+                continue
+            error = self.server.register(request)
+            if error is not None:
+                self.respond(error)
+                continue
+            # Checks run concurrently, so later lines can cancel earlier checks
+            thread = threading.Thread(target=self.check, args=(request,))
+            thread.start()
+            checks.append(thread)
+        for thread in checks:
+            thread.join()
+
+    def check(self, request: dict):
+        self.respond(self.server.run(request))
+
+    def respond(self, response: dict):
+        with self.write_lock:
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+parser = argparse.ArgumentParser(description="Verification server for python")
+parser.add_argument("socket", help="Path of the Unix domain socket to listen on")
+parser.add_argument(
+    "--cache-dir",
+    dest="cache_dir",
+    help="Directory to cache verified functions in, to skip them in later checks",
+)
+parser.add_argument(
+    "--cache-size",
+    dest="cache_size",
+    type=int,
+    default=4096,
+    help="Maximum number of cache entries",
+)
+
+
+def main(argv):
+    args = parser.parse_args(argv)
+    cache = FunctionCache(args.cache_dir, args.cache_size) if args.cache_dir else None
+    # Exit through `server_close` on SIGTERM as well, which removes the socket
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with VerificationServer(args.socket, cache) as server:
+        server.warm_up()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -24,6 +24,7 @@ from .types import (
     UnaryExpr,
     UnaryOperator,
     UnsupportedException,
+    walk,
 )
 
 __ALL__ = [
@@ -1,15 +1,13 @@
 import ast
 import typing
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from enum import Enum, auto
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
-    ast_node: typing.Optional[ast.AST] = field(compare=False, init=False)
-
-    def __post_init__(self):
-        self.ast_node = None
+    # The AST node the node was lowered from, set after it is constructed
+    ast_node: typing.Optional[ast.AST] = field(default=None, compare=False, init=False)
 
 
 class UnsupportedException(Exception):
@@ -57,74 +55,74 @@ class UnaryOperator(Enum):
     SUB = auto()
 
 
-@dataclass
+@dataclass(slots=True)
 class Expr(Node):
     type_: type
 
 
-@dataclass
+@dataclass(slots=True)
 class BinExpr(Expr):
     op: BinOperator
     lhs: Expr
     rhs: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class UnaryExpr(Expr):
     op: UnaryOperator
     operand: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class Constant(Expr):
     value: typing.Any
 
 
-@dataclass
+@dataclass(slots=True)
 class Stmt(Node):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class ExprStmt(Stmt):
     expr: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class Assert(Stmt):
     test: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class Name(Expr):
     ident: str
     ctx: ExprContext
 
 
-@dataclass
+@dataclass(slots=True)
 class Assign(Stmt):
     lhs: Name
     rhs: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class Module(Node):
     body: typing.List[Stmt]
 
 
-@dataclass
+@dataclass(slots=True)
 class Pass(Stmt):
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class If(Stmt):
     test: Expr
     body: typing.List[Stmt]
     orelse: typing.List[Stmt]
 
 
-@dataclass
+@dataclass(slots=True)
 class FuncDef(Stmt):
     name: str
     preconditions: typing.List[Expr]
@@ -137,13 +135,13 @@ class FuncDef(Stmt):
     post_astnode: typing.Optional[ast.AST] = field(compare=False, default=None)
 
 
-@dataclass
+@dataclass(slots=True)
 class Call(Expr):
     func: str
     args: typing.List[Expr]
 
 
-@dataclass
+@dataclass(slots=True)
 class Loop(Stmt):
     invariants: typing.List[Expr]
     test: Expr
@@ -151,7 +149,21 @@ class Loop(Stmt):
     variables: typing.List[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class NamedExpr(Expr):
     assignment: Assign
     rhs: Expr
+
+
+def walk(node: Node) -> typing.Iterator[Node]:
+    """Yield all HIR nodes in the tree starting at `node`, in no specified order"""
+    todo = [node]
+    while todo:
+        node = todo.pop()
+        yield node
+        for f in fields(node):
+            value = getattr(node, f.name)
+            if isinstance(value, Node):
+                todo.append(value)
+            elif isinstance(value, list):
+                todo.extend(v for v in value if isinstance(v, Node))
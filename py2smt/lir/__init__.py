@@ -1 +1,19 @@
-from .lower import Scope, ValidityScope, lower_mir_to_lir
+from .canonical import Canonicalizer, query_digest
+from .logic import infer_logic
+from .lower import (
+    Assume,
+    Call,
+    Constant,
+    DefineFun,
+    FunctionDef,
+    Ident,
+    Model,
+    Scope,
+    ValidityScope,
+    Z3Env,
+    assumption_literals,
+    lower_mir_to_lir,
+    write_smt,
+)
+from .sharing import share_subterms
+from .slicing import DependencyIndex, Query
@@ -0,0 +1,127 @@
+"""
+    Canonical forms of queries, to recognise the same query in other programs
+    and runs.
+
+    Identifiers depend on where a query occurs: SSA versions like `a$0_1$3`, the
+    counter in `!call_N!` prefixes and the names of functions. The canonical
+    form renames the declared identifiers and the templates in the order of
+    their first use, and numbers the compound terms in the order they are first
+    built, after their arguments. Declarations that are not used do not appear
+    in it. The form is fed to a hash rather than kept, so the digest of a
+    context can be extended statement by statement.
+"""
+import hashlib
+import typing
+from collections import ChainMap
+
+from .lower import (
+    Assume,
+    Call,
+    Constant,
+    DefineFun,
+    Expr,
+    FunctionDef,
+    Ident,
+    ValidityScope,
+)
+from .slicing import Query
+
+
+class Canonicalizer:
+    """Feeds the canonical form of statements to a hash. `scope_digest` gives the
+    digest of a validity scope in the context of the statements fed before"""
+
+    def __init__(
+        self,
+        function_defs: typing.Iterable[FunctionDef],
+        templates: typing.Iterable[DefineFun] = (),
+    ):
+        self.sorts = {
+            def_.ident.ident: f"({' '.join(map(str, def_.args))}) {def_.sort}"
+            for def_ in function_defs
+        }
+        self.templates = {template.ident.ident: template for template in templates}
+        self.hash = hashlib.sha256()
+        # Canonical names of identifiers, templates and compound terms by id
+        self.names: typing.MutableMapping[str, str] = {}
+        self.template_names: typing.MutableMapping[str, str] = {}
+        self.terms: typing.MutableMapping[int, str] = {}
+
+    def emit(self, text: str):
+        self.hash.update(text.encode())
+        self.hash.update(b"\n")
+
+    def ident(self, ident: str) -> str:
+        if ident not in self.names:
+            name = self.names[ident] = f"v{len(self.names)}"
+            self.emit(f"(declare {name} {self.sorts[ident]})")
+        return self.names[ident]
+
+    def template(self, ident: str) -> str:
+        if ident not in self.template_names:
+            template = self.templates[ident]
+            # The arguments of a template are its only identifiers
+            inner = Canonicalizer(template.args, self.templates.values())
+            args = " ".join(inner.ident(arg.ident.ident) for arg in template.args)
+            inner.emit(inner.expr(template.expr))
+            name = self.template_names[ident] = f"f{len(self.template_names)}"
+            self.emit(f"(define {name} ({args}) {inner.hash.hexdigest()})")
+        return self.template_names[ident]
+
+    def expr(self, expr: Expr) -> str:
+        """The canonical name of `expr`, after feeding the terms it is built of"""
+        # Post-order traversal, with a stack rather than recursion
+        stack: typing.List[typing.Tuple[Expr, bool]] = [(expr, False)]
+        while stack:
+            term, args_done = stack.pop()
+            if not isinstance(term, Call) or id(term) in self.terms:
+                continue
+            if not args_done:
+                stack.append((term, True))
+                stack.extend((arg, False) for arg in reversed(term.args))
+                continue
+            func = term.func
+            if func in self.templates:
+                func = self.template(func)
+            elif func in self.sorts:
+                # An uninterpreted function, named like an identifier
+                func = self.ident(func)
+            args = " ".join(self.name(arg) for arg in term.args)
+            name = self.terms[id(term)] = f"t{len(self.terms)}"
+            self.emit(f"({name} {func} {args})")
+        return self.name(expr)
+
+    def name(self, expr: Expr) -> str:
+        if isinstance(expr, Call):
+            return self.terms[id(expr)]
+        elif isinstance(expr, Ident):
+            return self.ident(expr.ident)
+        assert isinstance(expr, Constant)
+        value = expr.value
+        if isinstance(value, (bool, int)):
+            return "".join(expr.smt_parts())
+        return f"(real {value})"
+
+    def assume(self, assumption: Assume):
+        self.emit(f"(assert {self.expr(assumption.expr)})")
+
+    def scope_digest(self, scope: ValidityScope) -> str:
+        """The digest of `scope` in the current context, which it does not change"""
+        inner = Canonicalizer((), ())
+        inner.sorts, inner.templates = self.sorts, self.templates
+        inner.hash = self.hash.copy()
+        inner.names = ChainMap({}, self.names)
+        inner.template_names = ChainMap({}, self.template_names)
+        inner.terms = ChainMap({}, self.terms)
+        for assumption in scope.assumptions:
+            inner.assume(assumption)
+        inner.emit(f"(check {inner.expr(scope.test)})")
+        return inner.hash.hexdigest()
+
+
+def query_digest(query: Query) -> str:
+    """The digest of a `Query`"""
+    canonicalizer = Canonicalizer(query.function_defs, query.templates)
+    for assumption in query.assumptions:
+        canonicalizer.assume(assumption)
+    return canonicalizer.scope_digest(query.scope)
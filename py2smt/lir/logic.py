@@ -0,0 +1,126 @@
+"""
+    Inference of the SMT-LIB logic of LIR terms.
+
+    The features of a term are a bit mask of the sorts of arithmetic it uses and
+    whether it is nonlinear: multiplication of two non-constant terms, or
+    division and modulo by a non-constant term. The features of a set of terms
+    are the union of their features, and name a logic like `QF_LIA` or `QF_NIA`.
+    Calls of templates have the features of the template.
+"""
+import typing
+from fractions import Fraction
+
+from .lower import (
+    Assume,
+    Call,
+    Constant,
+    DefineFun,
+    Expr,
+    FunctionDef,
+    Ident,
+    Model,
+    ValidityScope,
+)
+
+INT = 1
+REAL = 2
+NONLINEAR = 4
+
+# Functions that are nonlinear unless all arguments, or all but the first for
+# divisions, are constants
+_PRODUCTS = {"*"}
+_DIVISIONS = {"/", "div", "mod"}
+
+
+def logic_name(features: int) -> str:
+    """The SMT-LIB logic of terms with `features`. Terms without arithmetic only
+    use booleans, which is `QF_UF` without uninterpreted functions"""
+    sorts = {INT: "IA", REAL: "RA", INT | REAL: "IRA"}.get(features & (INT | REAL))
+    if sorts is None:
+        return "QF_UF"
+    return f"QF_{'N' if features & NONLINEAR else 'L'}{sorts}"
+
+
+class LogicInference:
+    """Infers the features of the terms of a model, caching the features of every
+    term by its id, so terms shared between statements are only inspected once"""
+
+    def __init__(
+        self,
+        function_defs: typing.Iterable[FunctionDef],
+        templates: typing.Iterable[DefineFun] = (),
+    ):
+        self.sorts = {def_.ident.ident: str(def_.sort) for def_ in function_defs}
+        self.templates = {template.ident.ident: template for template in templates}
+        self.template_features: typing.Dict[str, int] = {}
+        self.features_of: typing.Dict[int, int] = {}
+
+    def features(self, expr: Expr) -> int:
+        # Post-order traversal, with a stack rather than recursion
+        stack: typing.List[typing.Tuple[Expr, bool]] = [(expr, False)]
+        while stack:
+            term, args_done = stack.pop()
+            if id(term) in self.features_of:
+                continue
+            if isinstance(term, Call) and not args_done:
+                stack.append((term, True))
+                stack.extend((arg, False) for arg in term.args)
+                continue
+            self.features_of[id(term)] = self.own_features(term)
+        return self.features_of[id(expr)]
+
+    def own_features(self, term: Expr) -> int:
+        if isinstance(term, Constant):
+            if isinstance(term.value, bool):
+                return 0
+            return REAL if isinstance(term.value, (float, Fraction)) else INT
+        elif isinstance(term, Ident):
+            return {"Int": INT, "Real": REAL}.get(self.sorts.get(term.ident, ""), 0)
+
+        assert isinstance(term, Call)
+        features = 0
+        for arg in term.args:
+            features |= self.features_of[id(arg)]
+        variable = [not isinstance(arg, Constant) for arg in term.args]
+        if term.func in _PRODUCTS and sum(variable) > 1:
+            features |= NONLINEAR
+        elif term.func in _DIVISIONS and any(variable[1:]):
+            features |= NONLINEAR
+        if term.func == "/":
+            features |= REAL
+        elif term.func in self.templates:
+            features |= self.template(term.func)
+        return features
+
+    def template(self, name: str) -> int:
+        if name not in self.template_features:
+            template = self.templates[name]
+            # The identifiers in a template are its arguments
+            inference = LogicInference(template.args, self.templates.values())
+            self.template_features[name] = inference.features(template.expr)
+        return self.template_features[name]
+
+    def assumptions(self, assumptions: typing.Iterable[Assume]) -> int:
+        features = 0
+        for assumption in assumptions:
+            features |= self.features(assumption.expr)
+        return features
+
+
+def infer_logic(model: Model) -> Model:
+    """Set the logic of `model`, and of each of its validity scopes together with
+    the assumptions before it, in place"""
+    inference = LogicInference(model.function_defs, model.templates)
+    context = 0
+    features = 0
+    for stmt in model.body:
+        if isinstance(stmt, ValidityScope):
+            scope = inference.features(stmt.test)
+            scope |= inference.assumptions(stmt.assumptions)
+            stmt.logic = logic_name(context | scope)
+            features |= scope
+            context |= inference.assumptions(stmt.post)
+        else:
+            context |= inference.features(stmt.expr)
+    model.logic = logic_name(context | features)
+    return model
@@ -1,4 +1,9 @@
+from __future__ import annotations  # Allow self-referential types without quotes
+
 import ast
+import functools
+import io
+import operator
 import typing
 from collections import ChainMap
 from dataclasses import dataclass, field
@@ -9,103 +14,328 @@ from py2smt import mir
 from py2smt.visitor import Visitor
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
-    ast_node: typing.Optional[ast.AST] = field(compare=False, init=False)
-
-    def __post_init__(self):
-        self.ast_node = None
+    # The AST node the node was lowered from, set after it is constructed
+    ast_node: typing.Optional[ast.AST] = field(default=None, compare=False, init=False)
 
+    def smt_parts(self) -> typing.List[str | Node]:
+        """The SMT-LIB rendering of this node, as strings and child nodes to render
+        in their place"""
+        raise NotImplementedError
 
-@dataclass
+    def to_smt(self) -> str:
+        stream = io.StringIO()
+        write_smt(self, stream)
+        return stream.getvalue()
+
+
+# Number of strings to collect before writing them to the stream at once
+WRITE_BUFFER_SIZE = 4096
+
+
+def write_smt(node: Node, stream: typing.TextIO):
+    """Write the SMT-LIB rendering of `node` to `stream`. This uses a stack rather
+    than recursion, so deeply nested expressions do not exhaust the Python stack.
+
+    Terms defined by a `DefineFun` that was written before are written as the
+    name of the definition."""
+    buffer: typing.List[str] = []
+    stack: typing.List[str | Node] = [node]
+    # Names of the defined terms, by their id
+    names: typing.Dict[int, str] = {}
+    while stack:
+        part = stack.pop()
+        if isinstance(part, str):
+            buffer.append(part)
+            if len(buffer) >= WRITE_BUFFER_SIZE:
+                stream.write("".join(buffer))
+                buffer.clear()
+        elif id(part) in names:
+            buffer.append(names[id(part)])
+        else:
+            stack.extend(reversed(part.smt_parts()))
+            if isinstance(part, DefineFun):
+                names[id(part.expr)] = part.ident.ident
+    stream.write("".join(buffer))
+
+
+def _real_div(lhs, rhs):
+    if z3.is_int(lhs):
+        lhs = z3.ToReal(lhs)
+    if z3.is_int(rhs):
+        rhs = z3.ToReal(rhs)
+    return lhs / rhs
+
+
+def _left_fold(op):
+    return lambda *args: functools.reduce(op, args)
+
+
+def _minus(*args):
+    if len(args) == 1:
+        return -args[0]
+    return functools.reduce(operator.sub, args)
+
+
+# Maps the SMT-LIB function names used in LIR to their z3 counterparts
+Z3_FUNCTIONS: typing.Dict[str, typing.Callable[..., z3.ExprRef]] = {
+    "+": _left_fold(operator.add),
+    "-": _minus,
+    "*": _left_fold(operator.mul),
+    "/": _left_fold(_real_div),
+    # z3's `/` and `%` on integers are SMT-LIB's `div` and `mod`
+    "div": _left_fold(operator.truediv),
+    "mod": _left_fold(operator.mod),
+    "=": operator.eq,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "and": lambda *args: z3.And(*args) if args else z3.BoolVal(True),
+    "or": lambda *args: z3.Or(*args) if args else z3.BoolVal(False),
+    "not": z3.Not,
+    "=>": z3.Implies,
+    "ite": z3.If,
+}
+
+
+@dataclass(slots=True)
 class Expr(Node):
-    def to_smt(self):
+    def to_z3(self, env: Z3Env) -> z3.ExprRef:
+        raise NotImplementedError
+
+    def free_idents(self) -> typing.Set[str]:
+        """The identifiers of the declared constants and functions used in this"""
         raise NotImplementedError
 
 
-@dataclass
+@dataclass(slots=True)
 class Constant(Node):
     value: typing.Any
 
-    def to_smt(self):
-        return str(self.value).lower()
+    def smt_parts(self):
+        if not isinstance(self.value, bool) and self.value < 0:
+            # SMT-LIB has no negative literals
+            return [f"(- {str(-self.value).lower()})"]
+        return [str(self.value).lower()]
+
+    def free_idents(self) -> typing.Set[str]:
+        return set()
 
+    def to_z3(self, env: Z3Env) -> z3.ExprRef:
+        if isinstance(self.value, bool):
+            return z3.BoolVal(self.value)
+        elif isinstance(self.value, int):
+            return z3.IntVal(self.value)
+        return z3.RealVal(self.value)
 
-@dataclass
+
+@dataclass(slots=True)
 class Ident(Expr):
     ident: str
 
-    def to_smt(self):
-        return self.ident
+    def smt_parts(self):
+        return [self.ident]
+
+    def to_z3(self, env: Z3Env) -> z3.ExprRef:
+        return env.decl(self.ident)
+
+    def free_idents(self) -> typing.Set[str]:
+        return {self.ident}
 
 
-@dataclass
+@dataclass(slots=True)
 class FunctionDef(Node):
     sort: z3.SortRef
     args: typing.List[z3.SortRef]
     ident: Ident
 
-    def to_smt(self):
-        return (
-            f"(declare-fun {self.ident.to_smt()} ({' '.join(self.args)}) {self.sort})"
-        )
+    def smt_parts(self):
+        args = " ".join(str(arg) for arg in self.args)
+        return [f"(declare-fun {self.ident.ident} ({args}) {self.sort})"]
+
+
+@dataclass(slots=True)
+class DefineFun(Node):
+    """Names a term. Without `args`, this is a term that is used more than once in
+    a `Model`; in SMT-LIB the term is written once, and replaced by the name
+    everywhere else. With `args`, this is a template that is instantiated by
+    calling it"""
 
+    sort: str
+    ident: Ident
+    expr: Expr
+    args: typing.List[FunctionDef] = field(default_factory=list)
+
+    def smt_parts(self):
+        args = " ".join(f"({arg.ident.ident} {arg.sort})" for arg in self.args)
+        return [
+            f"(define-fun {self.ident.ident} ({args}) {self.sort} ",
+            *self.expr.smt_parts(),
+            ")",
+        ]
 
-@dataclass
+
+@dataclass(slots=True)
 class Assume(Node):
     expr: Expr
 
-    def to_smt(self):
-        return f"(assert {self.expr.to_smt()})"
+    def smt_parts(self):
+        return ["(assert ", self.expr, ")"]
+
+    def to_z3(self, env: Z3Env) -> z3.ExprRef:
+        return self.expr.to_z3(env)
+
+    def free_idents(self) -> typing.Set[str]:
+        return self.expr.free_idents()
 
 
-@dataclass
+@dataclass(slots=True)
 class Scope(Node):
     stmts: typing.Any
 
-    def to_smt(self):
-        body = "\n".join(stmt.to_smt() for stmt in self.stmts if stmt)
-        return f"""(push 1)
-{body}
-(pop 1)"""
+    def smt_parts(self):
+        parts: typing.List[str | Node] = ["(push 1)"]
+        for stmt in self.stmts:
+            if stmt:
+                parts.extend(("\n", stmt))
+        return [*parts, "\n(pop 1)"]
 
 
-@dataclass
+@dataclass(slots=True)
 class ValidityScope(Node):
     ctx_name: str
     test: Expr
     assumptions: typing.List[Assume]
     post: typing.List[Assume] = field(default_factory=list)
-
-    def to_smt(self):
-        assumptions = (
-            ("\n" + "\n".join(ass.to_smt() for ass in self.assumptions))
-            if self.assumptions
-            else ""
-        )
-        post = (
-            ("\n" + "\n".join(ass.to_smt() for ass in self.post)) if self.post else ""
-        )
-        return f"""(push 1){assumptions}
-(assert (not {self.test.to_smt()}))
-(check-sat)
-(pop 1){post}"""
-
-
-@dataclass
+    # SMT-LIB logic of the validity scope with the assumptions before it
+    logic: typing.Optional[str] = None
+    # Name of the boolean that guards the assumptions and the negated test, see
+    # `assumption_literals`. Without it, they are asserted in a pushed scope
+    literal: typing.Optional[str] = None
+
+    def smt_parts(self):
+        if self.literal is None:
+            parts: typing.List[str | Node] = ["(push 1)"]
+            for assumption in self.assumptions:
+                parts.extend(("\n", assumption))
+            parts.extend(("\n(assert (not ", self.test, "))\n(check-sat)\n(pop 1)"))
+        else:
+            parts = [
+                f"(declare-fun {self.literal} () Bool)\n",
+                f"(assert (=> {self.literal} (and",
+            ]
+            for assumption in self.assumptions:
+                parts.extend((" ", assumption.expr))
+            parts.extend((" (not ", self.test, "))))\n"))
+            parts.append(f"(check-sat-assuming ({self.literal}))\n")
+            parts.append(f"(assert (not {self.literal}))")
+        for post in self.post:
+            parts.extend(("\n", post))
+        return parts
+
+    def to_z3_guarded(self, env: Z3Env) -> z3.ExprRef:
+        """The assumptions and the negated test, guarded by the literal"""
+        facts = [assumption.to_z3(env) for assumption in self.assumptions]
+        facts.append(z3.Not(self.test.to_z3(env)))
+        return z3.Implies(z3.Bool(self.literal), z3.And(*facts))
+
+
+@dataclass(slots=True)
 class Call(Expr):
     func: str
     args: typing.List[Expr]
 
-    def to_smt(self):
-        args = " ".join(arg.to_smt() for arg in self.args)
-        return f"({self.func} {args})"
-
-
-@dataclass
+    def smt_parts(self):
+        parts: typing.List[str | Node] = ["(", self.func]
+        for arg in self.args:
+            parts.extend((" ", arg))
+        return [*parts, ")"]
+
+    def to_z3(self, env: Z3Env) -> z3.ExprRef:
+        # Shared subterms are only built once
+        try:
+            return env.terms[id(self)]
+        except KeyError:
+            term = env.call(self.func, [arg.to_z3(env) for arg in self.args])
+            env.terms[id(self)] = term
+            return term
+
+    def free_idents(self) -> typing.Set[str]:
+        idents = set() if self.func in Z3_FUNCTIONS else {self.func}
+        for arg in self.args:
+            idents |= arg.free_idents()
+        return idents
+
+
+class Z3Env:
+    """Creates the z3 declarations for the identifiers of a `Model` on first use"""
+
+    def __init__(
+        self,
+        function_defs: typing.List[FunctionDef],
+        templates: typing.Sequence[DefineFun] = (),
+    ):
+        self.function_defs = {def_.ident.ident: def_ for def_ in function_defs}
+        self.templates = {template.ident.ident: template for template in templates}
+        # Templates as z3 terms over their arguments, by name
+        self.template_terms: typing.Dict[
+            str, typing.Tuple[typing.List[z3.ExprRef], z3.ExprRef]
+        ] = {}
+        self.decls: typing.Dict[str, z3.ExprRef | z3.FuncDeclRef] = {}
+        # z3 terms of `Call`s, by their id
+        self.terms: typing.Dict[int, z3.ExprRef] = {}
+
+    def decl(self, ident: str):
+        try:
+            return self.decls[ident]
+        except KeyError:
+            def_ = self.function_defs[ident]
+            if def_.args:
+                decl = z3.Function(ident, *def_.args, def_.sort)
+            else:
+                decl = z3.Const(ident, def_.sort)
+            self.decls[ident] = decl
+            return decl
+
+    def instantiate(self, name: str, args: typing.List[z3.ExprRef]) -> z3.ExprRef:
+        try:
+            params, term = self.template_terms[name]
+        except KeyError:
+            template = self.templates[name]
+            params = [z3.Const(arg.ident.ident, arg.sort) for arg in template.args]
+            env = Z3Env(template.args)
+            term = template.expr.to_z3(env)
+            self.template_terms[name] = (params, term)
+        return z3.substitute(term, *zip(params, args))
+
+    def call(self, func: str, args: typing.List[z3.ExprRef]) -> z3.ExprRef:
+        if func in Z3_FUNCTIONS:
+            return Z3_FUNCTIONS[func](*args)
+        elif func in self.templates:
+            return self.instantiate(func, args)
+        return self.decl(func)(*args)
+
+
+@dataclass(slots=True)
 class Model(Node):
     function_defs: typing.List[FunctionDef]
     body: typing.List[Assume | ValidityScope]
+    # Definitions of the terms that are used more than once, see `share_subterms`
+    shared: typing.List[DefineFun] = field(default_factory=list)
+    # Contract templates of the functions
+    templates: typing.List[DefineFun] = field(default_factory=list)
+    # SMT-LIB logic of the model, see `infer_logic`
+    logic: typing.Optional[str] = None
+
+    def smt_parts(self):
+        parts: typing.List[str | Node] = []
+        if self.logic is not None:
+            parts.append(f"(set-logic {self.logic})\n")
+        for node in [*self.function_defs, *self.templates, *self.shared, *self.body]:
+            parts.extend((node, "\n"))
+        return parts
 
 
 class MirVisitor(Visitor):
@@ -114,33 +344,63 @@ class MirVisitor(Visitor):
         bool: z3.BoolSort,
     }
 
+    # Operands of the expressions, which are lowered before them. The
+    # preconditions of a call that was lowered before are not lowered again
+    OPERANDS = {
+        mir.Call: lambda visitor, call: call.args,
+        mir.FuncCall: lambda visitor, call: (
+            () if id(call.return_value) in visitor.return_values else call.preconditions
+        ),
+        mir.NamedExpr: lambda visitor, expr: visitor.named_expr_operands(expr),
+    }
+
     def __init__(self):
         self.func_map = ChainMap(mir.lower.PREDEFINED_FUNCTIONS)
         self.prefix = ""
         self.stmts = []
         self.decls = []
         self.call_ctr = 0
+        # Return values of the calls that were lowered, by the id of their `Var`
+        self.return_values: typing.Dict[int, Ident] = {}
         self.in_funcdef = False
         self.ctx_name = "__main__"
+        # Path condition of the statement being lowered
+        self.path_condition: typing.List[mir.Expr] = []
 
     def visit_Var(self, var: mir.Var):
-        scope = "_".join(str(idx) for idx in var.scope)
-        prefix = self.prefix
         if var.ident == "__return__" and not self.in_funcdef:
-            prefix = f"!call_{self.call_ctr}!" + prefix
+            # Named by `visit_FuncCall` for the call it is the return value of
+            return self.return_values[id(var)]
+        return self.var_ident(var, self.prefix)
+
+    def var_ident(self, var: mir.Var, prefix: str) -> Ident:
+        scope = "_".join(str(idx) for idx in var.scope)
         return Ident(ident=f"{prefix}{var.ident}${scope}${var.version}")
 
     def visit_Constant(self, constant: mir.Constant):
         return Constant(constant.value)
 
-    def visit_Assign(self, assign: mir.Assign):
-        call = Call(func="=", args=[self.visit(assign.lhs), self.visit(assign.rhs)])
-        if pc := assign.path_condition:
+    def guarded(self, expr: Expr) -> Expr:
+        """Make `expr` conditional on the path condition of the current statement"""
+        if isinstance(expr, Constant) and expr.value is True:
+            return expr
+        if pc := self.path_condition:
             if len(pc) > 1:
                 condition = Call(func="and", args=[self.visit(cond) for cond in pc])
             else:
                 condition = self.visit(pc[0])
-            call = Call(func="=>", args=[condition, call])
+            return Call(func="=>", args=[condition, expr])
+        return expr
+
+    def visit_Assign(self, assign: mir.Assign):
+        # Calls on the right-hand side are guarded by the path condition too
+        self.path_condition = assign.path_condition
+        self.assign(assign, self.visit(assign.rhs))
+
+    def assign(self, assign: mir.Assign, rhs: Expr):
+        """Lower `assign`, whose right-hand side lowered to `rhs`"""
+        self.path_condition = assign.path_condition
+        call = self.guarded(Call(func="=", args=[self.visit(assign.lhs), rhs]))
         call.ast_node = assign.ast_node
         self.add_stmt(Assume(call), assign)
 
@@ -149,25 +409,51 @@ class MirVisitor(Visitor):
             self.add_const(self.visit(var), var.type_, var)
 
         self.func_map.maps.append(module.funcs)
+        templates = [
+            self.lower_template(func)
+            for func in module.funcs.values()
+            if func.body is not None
+        ]
         for stmt in module.body:
             self.visit(stmt)
 
-        return Model(function_defs=self.decls, body=self.stmts)
+        return Model(function_defs=self.decls, body=self.stmts, templates=templates)
 
-    def visit_Call(self, call: mir.Call):
+    def lower_template(self, func: mir.Func) -> DefineFun:
+        prefix, self.prefix = self.prefix, f"{func.ident}!"
+        # The return value is an argument, not the result of a call
+        self.in_funcdef = True
+        args = [
+            FunctionDef(sort=self.SORT_MAP[arg.type_](), ident=self.visit(arg), args=[])
+            for arg in func.args
+        ]
+        expr = self.visit(func.body)
+        self.in_funcdef = False
+        self.prefix = prefix
+        return DefineFun(
+            sort=str(self.SORT_MAP[func.body.type_]()),
+            ident=Ident(func.ident),
+            expr=expr,
+            args=args,
+        )
+
+    def visit_Call(self, call: mir.Call, *args: Expr):
         func = self.func_map[call.func]
-        return Call(func=func.ident, args=[self.visit(arg) for arg in call.args])
+        return Call(func=func.ident, args=list(args))
 
     def visit_Assert(self, assertion: mir.Assert):
+        self.path_condition = assertion.path_condition
         self.add_stmt(
             ValidityScope(
-                test=self.visit(assertion.test), assumptions=[], ctx_name=self.ctx_name
+                test=self.guarded(self.visit(assertion.test)),
+                assumptions=[],
+                ctx_name=self.ctx_name,
             ),
             assertion,
         )
 
     def visit_FuncDef(self, funcdef: mir.FuncDef):
-        old_ctx, self.ctx_name = funcdef.name, self.ctx_name
+        old_ctx, self.ctx_name = self.ctx_name, funcdef.name
         prefix = self.prefix
         self.prefix = f"{prefix}{funcdef.name}!"
         self.in_funcdef = True
@@ -180,9 +466,12 @@ class MirVisitor(Visitor):
         self.ctx_name = old_ctx
 
     def visit_Assumption(self, assumption: mir.Assumption):
-        self.add_stmt(Assume(self.visit(assumption.expr)), assumption)
+        self.path_condition = assumption.path_condition
+        self.add_stmt(Assume(self.guarded(self.visit(assumption.expr))), assumption)
 
     def and_exprs(self, exprs: typing.List[Expr]):
+        if len(exprs) == 1:
+            return exprs[0]
         return Call(func="and", args=exprs)
 
     def add_const(self, ident: Ident, type_: type, from_: mir.Node):
@@ -194,34 +483,59 @@ class MirVisitor(Visitor):
         stmt.ast_node = from_.ast_node
         self.stmts.append(stmt)
 
-    def visit_FuncCall(self, funccall: mir.FuncCall):
+    def visit_FuncCall(self, funccall: mir.FuncCall, *preconditions: Expr):
+        # Calls in arguments occur in both the pre- and postcondition, but are
+        # only made once
+        if id(funccall.return_value) in self.return_values:
+            return self.return_values[id(funccall.return_value)]
 
-        preconditions = [self.visit(condition) for condition in funccall.preconditions]
         if preconditions:
-            pre = self.and_exprs(preconditions)
+            pre = self.guarded(self.and_exprs(list(preconditions)))
             self.add_stmt(
                 ValidityScope(test=pre, assumptions=[], ctx_name=self.ctx_name),
                 funccall,
             )
 
         self.call_ctr += 1
-        return_value = self.visit(funccall.return_value)
+        return_value = self.var_ident(
+            funccall.return_value, f"!call_{self.call_ctr}!{self.prefix}"
+        )
+        self.return_values[id(funccall.return_value)] = return_value
         self.add_const(return_value, funccall.type_, funccall)
         postconditions = [
             self.visit(condition) for condition in funccall.postconditions
         ]
         if postconditions:
-            post = self.and_exprs(postconditions)
+            post = self.guarded(self.and_exprs(postconditions))
             # Assign temp var
             self.add_stmt(Assume(post), funccall)
         return return_value
 
-    def visit_NamedExpr(self, expr: mir.NamedExpr):
-        rhs = self.visit(expr.rhs)
-        self.visit(expr.assignment)
-        return rhs
+    def named_expr_operands(self, expr: mir.NamedExpr) -> typing.Tuple[mir.Expr, ...]:
+        # As in `visit_Assign`, the right-hand side is lowered in the path
+        # condition of the assignment
+        self.path_condition = expr.assignment.path_condition
+        return (expr.rhs, expr.assignment.rhs)
+
+    def visit_NamedExpr(self, expr: mir.NamedExpr, value: Expr, rhs: Expr):
+        self.assign(expr.assignment, rhs)
+        return value
 
 
 def lower_mir_to_lir(mir: mir.Module) -> Model:
     visitor = MirVisitor()
     return visitor.visit(mir)
+
+
+# Prefix of the names of the literals of validity scopes
+LITERAL_PREFIX = "!scope"
+
+
+def assumption_literals(model: Model) -> Model:
+    """Guard each validity scope of `model` by a literal of its own, in place.
+    The scopes are then checked assuming the literal, which is false afterwards,
+    instead of in a pushed scope, so the solver keeps what it learned"""
+    scopes = (stmt for stmt in model.body if isinstance(stmt, ValidityScope))
+    for idx, scope in enumerate(scopes):
+        scope.literal = f"{LITERAL_PREFIX}{idx}"
+    return model
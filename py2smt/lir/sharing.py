@@ -0,0 +1,124 @@
+"""
+    Hash-consing of LIR terms.
+
+    Lowering builds a new term for every use of an expression, so the same term
+    can occur many times, e.g. in loop invariants and path conditions. After
+    `share_subterms`, structurally equal terms are the same object. The z3
+    backend then builds each of them once, and the calls that occur more than
+    once are written once in SMT-LIB, as a `define-fun`.
+"""
+import typing
+
+from .lower import Assume, Call, Constant, DefineFun, Expr, Ident, Model
+
+# The functions in `Z3_FUNCTIONS` whose result is a boolean
+BOOL_FUNCTIONS = {"=", "<", "<=", ">", ">=", "and", "or", "not", "=>"}
+
+
+def _key(expr: Expr) -> typing.Hashable:
+    if isinstance(expr, Call):
+        # The arguments are already shared, so equal arguments are identical
+        return (Call, expr.func, tuple(id(arg) for arg in expr.args))
+    elif isinstance(expr, Ident):
+        return (Ident, expr.ident)
+    elif isinstance(expr, Constant):
+        return (Constant, type(expr.value), expr.value)
+    raise TypeError(f"Unexpected term {expr}")
+
+
+class _Sharer:
+    def __init__(self, model: Model):
+        self.sorts = {def_.ident.ident: str(def_.sort) for def_ in model.function_defs}
+        self.sorts.update(
+            (template.ident.ident, template.sort) for template in model.templates
+        )
+        self.table: typing.Dict[typing.Hashable, Expr] = {}
+        # Shared calls, with their arguments before them
+        self.calls: typing.List[Call] = []
+        self.roots: typing.List[Expr] = []
+        self.sort_of: typing.Dict[int, str] = {}
+
+    def share(self, root: Expr) -> Expr:
+        """Replace the terms in `root` by their shared equivalents, returning the
+        shared equivalent of `root`"""
+        # Post-order traversal, with a stack rather than recursion
+        stack: typing.List[typing.Tuple[Expr, bool]] = [(root, False)]
+        result: typing.List[Expr] = []
+        while stack:
+            expr, args_done = stack.pop()
+            if isinstance(expr, Call) and not args_done:
+                stack.append((expr, True))
+                stack.extend((arg, False) for arg in reversed(expr.args))
+                continue
+            if isinstance(expr, Call):
+                first_arg = len(result) - len(expr.args)
+                expr.args = result[first_arg:]
+                del result[first_arg:]
+            key = _key(expr)
+            if key in self.table:
+                shared = self.table[key]
+            else:
+                shared = self.table[key] = expr
+                self.sort_of[id(shared)] = self.infer_sort(shared)
+                if isinstance(shared, Call):
+                    self.calls.append(shared)
+            result.append(shared)
+        self.roots.append(result[0])
+        return result[0]
+
+    def uses(self) -> typing.Dict[int, int]:
+        """The number of statements and distinct calls using each term, by id"""
+        uses: typing.Dict[int, int] = {}
+        for expr in [*self.roots, *(arg for call in self.calls for arg in call.args)]:
+            uses[id(expr)] = uses.get(id(expr), 0) + 1
+        return uses
+
+    def infer_sort(self, expr: Expr) -> str:
+        if isinstance(expr, Constant):
+            if isinstance(expr.value, bool):
+                return "Bool"
+            return "Int" if isinstance(expr.value, int) else "Real"
+        elif isinstance(expr, Ident):
+            return self.sorts[expr.ident]
+        assert isinstance(expr, Call)
+        if expr.func in BOOL_FUNCTIONS:
+            return "Bool"
+        elif expr.func == "/":
+            return "Real"
+        elif expr.func in ("div", "mod"):
+            return "Int"
+        elif expr.func == "ite":
+            return self.sort_of[id(expr.args[1])]
+        elif expr.func in ("+", "-", "*"):
+            arg_sorts = {self.sort_of[id(arg)] for arg in expr.args}
+            return "Real" if "Real" in arg_sorts else "Int"
+        return self.sorts[expr.func]
+
+    def share_assume(self, assume: Assume):
+        assume.expr = self.share(assume.expr)
+
+
+def share_subterms(model: Model) -> Model:
+    """Make structurally equal terms in `model` identical, and define the calls that
+    are used more than once in `model.shared`, in place"""
+    sharer = _Sharer(model)
+    for stmt in model.body:
+        if isinstance(stmt, Assume):
+            sharer.share_assume(stmt)
+        else:
+            stmt.test = sharer.share(stmt.test)
+            for assume in [*stmt.assumptions, *stmt.post]:
+                sharer.share_assume(assume)
+
+    uses = sharer.uses()
+    # Calls on only identifiers and constants are about as short as their name
+    shared = [
+        call
+        for call in sharer.calls
+        if uses[id(call)] > 1 and any(isinstance(arg, Call) for arg in call.args)
+    ]
+    model.shared = [
+        DefineFun(sort=sharer.sort_of[id(call)], ident=Ident(f"!term{idx}"), expr=call)
+        for idx, call in enumerate(shared)
+    ]
+    return model
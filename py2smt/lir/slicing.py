@@ -0,0 +1,151 @@
+"""
+    Cone-of-influence slicing of a `Model`.
+
+    A validity scope only depends on the assumptions that share identifiers with
+    its test, directly or through other assumptions. Path conditions are guard
+    identifiers, so the assumptions defining the guards are part of the slice too.
+    Every validity scope becomes a `Query` with only that slice, which can be
+    solved on its own.
+
+    Assumptions outside of the slice cannot make a failing query hold, unless they
+    contradict each other. Slicing is therefore opt-in: a program whose
+    assumptions are contradictory checks with the full context, but fails sliced.
+"""
+import bisect
+import typing
+from collections import defaultdict
+from dataclasses import dataclass
+
+from .logic import LogicInference, logic_name
+from .lower import Assume, DefineFun, FunctionDef, Model, ValidityScope
+
+
+@dataclass
+class Query:
+    """A validity scope with the declarations and assumptions it depends on"""
+
+    # Index of the validity scope in the model
+    index: int
+    scope: ValidityScope
+    function_defs: typing.List[FunctionDef]
+    assumptions: typing.List[Assume]
+    templates: typing.List[DefineFun]
+    # SMT-LIB logic of the query
+    logic: typing.Optional[str] = None
+
+    def to_smt(self) -> typing.List[str]:
+        return [
+            *([f"(set-logic {self.logic})"] if self.logic is not None else []),
+            *(def_.to_smt() for def_ in self.function_defs),
+            *(template.to_smt() for template in self.templates),
+            *(assumption.to_smt() for assumption in self.assumptions),
+            self.scope.to_smt(),
+        ]
+
+
+class DependencyIndex:
+    """Indexes the assumptions of a model by the identifiers they use"""
+
+    def __init__(self, model: Model):
+        self.function_defs = {def_.ident.ident: def_ for def_ in model.function_defs}
+        self.templates = model.templates
+        template_names = {template.ident.ident for template in model.templates}
+        self.facts: typing.List[Assume] = []
+        self.fact_idents: typing.List[typing.Set[str]] = []
+        self.inference = LogicInference(model.function_defs, model.templates)
+        # The logic features of the facts, and of all facts up to each fact
+        self.fact_features: typing.List[int] = []
+        self.context_features: typing.List[int] = [0]
+        # Indices of the facts using an identifier, in ascending order
+        self.users: typing.Dict[str, typing.List[int]] = defaultdict(list)
+        # Validity scopes and the number of facts before them
+        self.scopes: typing.List[typing.Tuple[ValidityScope, int]] = []
+
+        for stmt in model.body:
+            if isinstance(stmt, ValidityScope):
+                self.scopes.append((stmt, len(self.facts)))
+                for post in stmt.post:
+                    self.add_fact(post, template_names)
+            else:
+                self.add_fact(stmt, template_names)
+
+    def add_fact(self, fact: Assume, template_names: typing.Set[str]):
+        idents = fact.free_idents()
+        # Templates do not relate the facts calling them
+        for ident in idents - template_names:
+            self.users[ident].append(len(self.facts))
+        self.facts.append(fact)
+        self.fact_idents.append(idents)
+        self.fact_features.append(self.inference.features(fact.expr))
+        self.context_features.append(self.context_features[-1] | self.fact_features[-1])
+
+    def scope_features(self, scope: ValidityScope) -> int:
+        features = self.inference.features(scope.test)
+        return features | self.inference.assumptions(scope.assumptions)
+
+    def __len__(self):
+        return len(self.scopes)
+
+    def slice(self, index: int) -> Query:
+        """The query for the `index`th validity scope"""
+        scope, n_facts = self.scopes[index]
+        idents = scope.test.free_idents()
+        for assumption in scope.assumptions:
+            idents |= assumption.free_idents()
+
+        included: typing.Set[int] = set()
+        worklist = list(idents)
+        while worklist:
+            users = self.users.get(worklist.pop(), [])
+            # Only facts before the validity scope are known there
+            for fact in users[: bisect.bisect_left(users, n_facts)]:
+                if fact not in included:
+                    included.add(fact)
+                    new_idents = self.fact_idents[fact] - idents
+                    idents |= new_idents
+                    worklist.extend(new_idents)
+
+        features = self.scope_features(scope)
+        for fact in included:
+            features |= self.fact_features[fact]
+        return Query(
+            index=index,
+            scope=scope,
+            function_defs=[
+                def_ for ident, def_ in self.function_defs.items() if ident in idents
+            ],
+            assumptions=[self.facts[fact] for fact in sorted(included)],
+            templates=[
+                template
+                for template in self.templates
+                if template.ident.ident in idents
+            ],
+            logic=logic_name(features),
+        )
+
+    def context(self, index: int) -> Query:
+        """The query for the `index`th validity scope, with all declarations and
+        all assumptions before it"""
+        scope, n_facts = self.scopes[index]
+        return Query(
+            index=index,
+            scope=scope,
+            function_defs=list(self.function_defs.values()),
+            assumptions=self.facts[:n_facts],
+            templates=self.templates,
+            logic=logic_name(
+                self.context_features[n_facts] | self.scope_features(scope)
+            ),
+        )
+
+    def queries(
+        self,
+        selected: typing.Optional[typing.Iterable[int]] = None,
+        sliced: bool = True,
+    ) -> typing.List[Query]:
+        """The queries for the validity scopes whose index is in `selected`, or all.
+        Without `sliced`, the queries have the full context of the validity scope"""
+        if selected is None:
+            selected = range(len(self))
+        query = self.slice if sliced else self.context
+        return [query(index) for index in selected]
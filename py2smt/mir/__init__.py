@@ -1,4 +1,5 @@
 from .lower import lower_hir_to_mir
+from .optimize import optimize_mir
 from .types import (
     Assert,
     Assign,
@@ -5,6 +5,7 @@ from collections import OrderedDict, defaultdict
 from dataclasses import dataclass, field
 
 from py2smt import hir
+from py2smt.cache import FunctionCache, StatementCache
 from py2smt.exceptions import IllegalOperationException
 from py2smt.hir import BinOperator as BO
 from py2smt.hir import UnaryOperator as UO
@@ -27,7 +28,9 @@ PREDEFINED_FUNCTIONS = {
     -13: mir.Func(id=mir.FuncId(-13), ident=mir.Ident("or")),
     -14: mir.Func(id=mir.FuncId(-14), ident=mir.Ident("not")),
     -15: mir.Func(id=mir.FuncId(-5), ident=mir.Ident("div")),
+    -16: mir.Func(id=mir.FuncId(-16), ident=mir.Ident("ite")),
 }
+ITE = mir.FuncId(-16)
 PREDEFINED_FUNCTION_MAP = {
     BO.ADD: -1,
     BO.SUB: -2,
@@ -53,6 +56,10 @@ class DeclaredFunc:
     args: OrderedDict[str, hir.Name]
     preconditions: typing.List[hir.Expr]
     postconditions: typing.List[hir.Expr]
+    # Templates of the contract, instantiated at every call. The postcondition
+    # takes the return value as its last argument
+    precondition: typing.Optional[mir.FuncId] = field(default=None, compare=False)
+    postcondition: typing.Optional[mir.FuncId] = field(default=None, compare=False)
 
 
 @dataclass
@@ -68,6 +75,24 @@ class Branch:
         default_factory=dict
     )
     _condition: typing.Optional[mir.Expr] = None
+    # Boolean constant that holds iff this branch is taken. Branches with a
+    # condition define their own guard as the parent's guard and their condition.
+    guard: typing.Optional[mir.Var] = None
+    # Computed once, shared by all variables in this branch
+    _canonical_idx: typing.Optional[typing.List[int]] = field(
+        default=None, repr=False, compare=False
+    )
+    # Flattened view of the latest version of every variable visible from this
+    # branch. Created from the parent's view on first use, so parents must not
+    # store variables while a subscope is in use.
+    _env: typing.Optional[typing.Dict[mir.Ident, mir.Expr]] = field(
+        default=None, repr=False, compare=False
+    )
+    # All variables and guards created in this branch and its relatives, shared
+    # with the parent. These all need to be declared.
+    declarations: typing.List[mir.Var] = field(
+        default_factory=list, repr=False, compare=False
+    )
 
     def havoc(self, idents: typing.List[mir.Ident]):
         for ident in idents:
@@ -75,68 +100,112 @@ class Branch:
 
     @property
     def condition(self):
-        return [
-            parent._condition
-            for parent in self.iter_parents()
-            if parent._condition is not None
-        ]
-
-    def iter_parents(self):
-        it = self
-        while it is not None:
-            yield it
-            it = it.parent
+        return [self.guard] if self.guard is not None else []
 
     def subscope(self, condition=None) -> Branch:
         self.subscope_idx += 1
         new = Branch(
-            parent=self, idx=self.subscope_idx, subscopes=[], _condition=condition
+            parent=self,
+            idx=self.subscope_idx,
+            subscopes=[],
+            _condition=condition,
+            guard=self.guard,
+            declarations=self.declarations,
         )
+        if condition is not None:
+            new.guard = mir.Var(
+                type_=bool,
+                ident=mir.Ident("!guard"),
+                version=0,
+                scope=new.canonical_idx(),
+            )
+            self.declarations.append(new.guard)
         self.subscopes.append(new)
         return new
 
+    def guard_definition(self) -> typing.List[mir.Assign]:
+        """The assignment defining this branch's own guard, if it has one"""
+        if self._condition is None:
+            return []
+        parent_guard = self.parent.guard if self.parent else None
+        if parent_guard is None:
+            rhs = self._condition
+        else:
+            rhs = mir.Call(
+                type_=bool,
+                func=mir.FuncId(PREDEFINED_FUNCTION_MAP[BO.AND]),
+                args=[parent_guard, self._condition],
+            )
+        return [mir.Assign(path_condition=[], lhs=self.guard, rhs=rhs)]
+
     def canonical_idx(self) -> typing.List[int]:
-        return [scope.idx for scope in reversed(list(self.iter_parents()))]
+        if self._canonical_idx is None:
+            parent_idx = self.parent.canonical_idx() if self.parent else []
+            self._canonical_idx = [*parent_idx, self.idx]
+        return self._canonical_idx
+
+    def env(self) -> typing.Dict[mir.Ident, mir.Expr]:
+        if self._env is None:
+            self._env = dict(self.parent.env()) if self.parent else {}
+            self._env.update(
+                (ident, versions[-1]) for ident, versions in self.variables.items()
+            )
+        return self._env
 
     def resolve_var(self, ident: mir.Ident) -> mir.Expr:
         """Resolve variable by identifier from this subscope upwards"""
         try:
-            return self.variables[ident][-1]
+            return self.env()[ident]
         except KeyError:
-            if self.parent:
-                return self.parent.resolve_var(ident)
-            else:
-                raise IllegalOperationException("Cannot LOAD undefined variable")
-
-    def reconcile_subscopes(self) -> (typing.List[mir.Assign]):
-        """Pop direct subscopes and emit the proper assignments for reconciling them"""
-        new_vars: typing.Dict[mir.Ident, mir.Var] = dict()
+            raise IllegalOperationException("Cannot LOAD undefined variable")
+
+    def bind(self, ident: mir.Ident, expr: mir.Expr):
+        """Add `expr` as the latest version of `ident` in this scope"""
+        self.variables.setdefault(ident, []).append(expr)
+        if self._env is not None:
+            self._env[ident] = expr
+
+    def reconcile_subscopes(self, exhaustive: bool = False) -> typing.List[mir.Assign]:
+        """Pop direct subscopes and emit the assignments merging the variables
+        they changed back into this scope, as a new version defined by one `ite`
+        over the subscopes' conditions. If the subscopes are not `exhaustive`,
+        the merge keeps the current version when none of them is taken."""
+        subscopes, self.subscopes = self.subscopes, []
+        changed = dict.fromkeys(
+            ident for scope in subscopes for ident in scope.variables
+        )
         assignments = []
-        for scope in self.subscopes:
-            for ident, versions in scope.variables.items():
-                # Create new var in this scope
-                new_var = self._make_var(ident, versions[-1].type_)
-                var = new_vars.setdefault(ident, new_var)
-
-        for var in new_vars.values():
-            # Emit assignment of the new variable to the last version in this scope, under its path condition
-            for scope in self.subscopes:
-                assignments.append(
-                    mir.Assign(
-                        path_condition=scope.condition,
-                        lhs=var,
-                        rhs=scope.resolve_var(var.ident),
+        for ident in changed:
+            scopes = subscopes
+            current = self.env().get(ident)
+            if exhaustive and scopes:
+                *scopes, last = scopes
+                value = last.variables[ident][-1] if ident in last.variables else current
+            else:
+                value = current
+
+            for scope in reversed(scopes):
+                # A subscope that does not assign the variable keeps the version
+                # from before it
+                then = scope.variables[ident][-1] if ident in scope.variables else current
+                if then is None or then is value:
+                    continue
+                if value is None or scope._condition is None:
+                    value = then
+                else:
+                    value = mir.Call(
+                        type_=then.type_,
+                        func=ITE,
+                        args=[scope._condition, then, value],
                     )
-                )
-                # Then add all versions of the variable to this scope's versions.
-                # This is sound, because we later add the new version for this specific
-                # scope as well, to which the ident will then resolve in this scope
-                # and future subscopes.
-                self.variables.setdefault(var.ident, []).extend(
-                    scope.variables.get(var.ident, [])
-                )
 
-            self.variables.setdefault(var.ident, []).append(var)
+            var = self._make_var(ident, value.type_)
+            if var.ast_node is None:
+                var.ast_node = value.ast_node
+            self.bind(ident, var)
+            assignments.append(
+                mir.Assign(path_condition=self.condition, lhs=var, rhs=value)
+            )
 
         return assignments
 
@@ -147,18 +216,42 @@ class Branch:
         )
         if versions:
             new.ast_node = versions[-1].ast_node
+        self.declarations.append(new)
         return new
 
+    def grouped_declarations(self) -> typing.List[mir.Var]:
+        """`declarations`, with all versions of a variable grouped together"""
+        groups: typing.Dict[mir.Ident, typing.List[mir.Var]] = {}
+        for var in self.declarations:
+            groups.setdefault(var.ident, []).append(var)
+        return [var for group in groups.values() for var in group]
+
     def store_var(self, ident: mir.Ident, type_: type) -> mir.Var:
         new = self._make_var(ident, type_)
-        self.variables.setdefault(ident, []).append(new)
+        self.bind(ident, new)
         return new
 
 
 class HirVisitor(Visitor):
-    def __init__(self):
+    # Operands of the expressions, which are lowered before them
+    OPERANDS = {
+        hir.BinExpr: lambda visitor, expr: (expr.lhs, expr.rhs),
+        hir.UnaryExpr: lambda visitor, expr: (expr.operand,),
+        hir.Call: lambda visitor, call: call.args,
+        hir.NamedExpr: lambda visitor, expr: (expr.assignment.rhs,),
+    }
+
+    def __init__(
+        self,
+        cache: typing.Optional[FunctionCache] = None,
+        statement_cache: typing.Optional[StatementCache] = None,
+    ):
         self.variables = defaultdict(list)
         self.func_map = {}
+        self.cache = cache
+        self.statement_cache = statement_cache
+        # Contract templates of the declared functions
+        self.templates: typing.Dict[mir.FuncId, mir.Func] = {}
 
         self.scope = Branch()
 
@@ -187,19 +280,20 @@ class HirVisitor(Visitor):
 
     def visit_Assign(self, assign: hir.Assign) -> mir.Assign:
         # If assigning to self, rhs is an older version, so resolve it first
-        rhs = self.visit(assign.rhs)
-        lhs = self.visit(assign.lhs)
-        return mir.Assign(path_condition=self.scope.condition, lhs=lhs, rhs=rhs)
+        return self.assign(assign, self.visit(assign.rhs))
 
-    def visit_BinExpr(self, expr: hir.BinExpr):
-        lhs = self.visit(expr.lhs)
-        rhs = self.visit(expr.rhs)
+    def assign(self, assign: hir.Assign, rhs: mir.Expr) -> mir.Assign:
+        """Lower `assign`, whose right-hand side lowered to `rhs`"""
+        lhs = self.visit(assign.lhs)
+        result = mir.Assign(path_condition=self.scope.condition, lhs=lhs, rhs=rhs)
+        result.ast_node = assign.ast_node
+        return result
 
+    def visit_BinExpr(self, expr: hir.BinExpr, lhs: mir.Expr, rhs: mir.Expr):
         func = PREDEFINED_FUNCTION_MAP[expr.op]
         return mir.Call(type_=expr.type_, func=mir.FuncId(func), args=[lhs, rhs])
 
-    def visit_UnaryExpr(self, expr: hir.UnaryExpr):
-        operand = self.visit(expr.operand)
+    def visit_UnaryExpr(self, expr: hir.UnaryExpr, operand: mir.Expr):
         func = PREDEFINED_FUNCTION_MAP[expr.op]
         return mir.Call(type_=expr.type_, func=mir.FuncId(func), args=[operand])
 
@@ -231,31 +325,125 @@ class HirVisitor(Visitor):
     def visit_If(self, if_stmt: hir.If):
         condition = self.visit(if_stmt.test)
         self.push_scope(condition)
-        body_stmts = self.visit_stmts(if_stmt.body)
+        body_stmts = [
+            *self.scope.guard_definition(),
+            *self.visit_stmts(if_stmt.body),
+        ]
         self.pop_scope()
         self.push_scope(self.not_expr(condition))
-        else_stmts = self.visit_stmts(if_stmt.orelse)
+        else_stmts = [
+            *self.scope.guard_definition(),
+            *self.visit_stmts(if_stmt.orelse),
+        ]
         self.pop_scope()
-        extra_assigns = self.scope.reconcile_subscopes()
+        extra_assigns = self.scope.reconcile_subscopes(exhaustive=True)
         return [*body_stmts, *else_stmts, *extra_assigns]
 
     def visit_Module(self, module: hir.Module):
         stmts = self.visit_stmts(module.body)
         return mir.Module(
-            vars=[var for ident in self.scope.variables.values() for var in ident],
+            vars=self.scope.grouped_declarations(),
             body=stmts,
-            funcs={},
+            funcs=self.templates,
+            statement_keys=self.statement_keys(module.body),
+        )
+
+    def statement_keys(self, stmts: typing.List[hir.Stmt]):
+        if self.statement_cache is None:
+            return []
+        keys = []
+        key = None
+        for stmt in stmts:
+            if isinstance(stmt, hir.FuncDef):
+                # The statements after a function only depend on its contract
+                contract = (
+                    stmt.name,
+                    stmt.arguments,
+                    stmt.preconditions,
+                    stmt.postconditions,
+                    stmt.ret_type,
+                )
+                key = self.statement_cache.key(key, contract)
+                continue
+            key = self.statement_cache.key(key, stmt)
+            if stmt.ast_node is not None:
+                keys.append((stmt.ast_node.lineno, stmt.ast_node.end_lineno, key))
+        return keys
+
+    def contract_template(
+        self,
+        name: str,
+        arguments: typing.List[hir.Name],
+        conditions: typing.List[hir.Expr],
+        ret_type: typing.Optional[type] = None,
+    ) -> typing.Optional[mir.FuncId]:
+        """Lower `conditions` once, to a predicate on the arguments of the function
+        and, if `ret_type` is given, its return value"""
+        if not conditions:
+            return None
+        visitor = HirVisitor()
+        args = [
+            visitor.scope.store_var(mir.Ident(arg.ident), arg.type_)
+            for arg in arguments
+        ]
+        if ret_type is not None:
+            args.append(visitor.scope.store_var(mir.Ident("__return__"), ret_type))
+        exprs = [visitor.visit(condition) for condition in conditions]
+        func_id = mir.FuncId(len(self.templates))
+        self.templates[func_id] = mir.Func(
+            id=func_id,
+            ident=mir.Ident(name),
+            args=args,
+            body=exprs[0] if len(exprs) == 1 else visitor.and_exprs(exprs),
         )
+        return func_id
 
     def visit_FuncDef(self, funcdef: hir.FuncDef) -> mir.FuncDef:
+        declared_func = DeclaredFunc(
+            args=OrderedDict((arg.ident, arg) for arg in funcdef.arguments),
+            preconditions=funcdef.preconditions,
+            postconditions=funcdef.postconditions,
+            precondition=self.contract_template(
+                f"{funcdef.name}!pre", funcdef.arguments, funcdef.preconditions
+            ),
+            postcondition=self.contract_template(
+                f"{funcdef.name}!post",
+                funcdef.arguments,
+                funcdef.postconditions,
+                funcdef.ret_type,
+            ),
+        )
+        cache_key = None
+        if self.cache:
+            # The verification of a function only depends on its own definition
+            # and the contracts of the functions it calls
+            callees = sorted(
+                {
+                    node.func
+                    for node in hir.walk(funcdef)
+                    if isinstance(node, hir.Call) and node.func in self.func_map
+                }
+            )
+            cache_key = self.cache.key(
+                funcdef, [(name, self.func_map[name]) for name in callees]
+            )
+            if self.cache.is_verified(cache_key):
+                self.func_map[funcdef.name] = declared_func
+                return mir.FuncDef(
+                    path_condition=self.scope.condition,
+                    name=mir.Ident(funcdef.name),
+                    variables=[],
+                    body=[],
+                    ret_type=funcdef.ret_type,
+                    cache_key=cache_key,
+                    verified=True,
+                )
+
         visitor = HirVisitor()
 
-        args = []
-        unresolved_args = OrderedDict()
         # Functions have their own separate scope for var and func resolution
         for arg in funcdef.arguments:
-            unresolved_args[arg.ident] = arg
-            args.append(visitor.scope.store_var(mir.Ident(arg.ident), arg.type_))
+            visitor.scope.store_var(mir.Ident(arg.ident), arg.type_)
 
         preconditions = [
             mir.Assumption(path_condition=[], expr=visitor.visit(expr))
@@ -277,39 +465,43 @@ class HirVisitor(Visitor):
         else:
             body = [*preconditions, *body]
 
-        vars_ = [var for ident in visitor.scope.variables.values() for var in ident]
+        vars_ = visitor.scope.grouped_declarations()
         ret = mir.FuncDef(
             path_condition=self.scope.condition,
             name=mir.Ident(funcdef.name),
             variables=vars_,
             body=body,
             ret_type=funcdef.ret_type,
+            cache_key=cache_key,
         )
 
-        self.func_map[funcdef.name] = DeclaredFunc(
-            args=unresolved_args,
-            preconditions=funcdef.preconditions,
-            postconditions=funcdef.postconditions,
-        )
+        self.func_map[funcdef.name] = declared_func
         return ret
 
-    def visit_Call(self, call: hir.Call):
+    def visit_Call(self, call: hir.Call, *lowered: mir.Expr):
         declared_func: DeclaredFunc = self.func_map[call.func]
-        # Set up scope, so that function arguments resolve to our current versions
-        visitor = HirVisitor()
-        for (expr, arg) in zip(call.args, declared_func.args.values()):
-            visitor.scope.variables.setdefault(arg.ident, []).append(self.visit(expr))
-
-        # Resolve variables for preconditions
-        preconditions = [
-            visitor.visit(condition) for condition in declared_func.preconditions
-        ]
+        # The contract is only instantiated with the lowered arguments here. The
+        # same argument expressions are used in both, so calls in them are
+        # lowered once
+        args = list(lowered)
+
+        preconditions = []
+        if declared_func.precondition is not None:
+            preconditions.append(
+                mir.Call(type_=bool, func=declared_func.precondition, args=args)
+            )
 
         # Create var for return
-        return_value = visitor.scope.store_var("__return__", call.type_)
-        postconditions = [
-            visitor.visit(condition) for condition in declared_func.postconditions
-        ]
+        return_value = Branch().store_var(mir.Ident("__return__"), call.type_)
+        postconditions = []
+        if declared_func.postcondition is not None:
+            postconditions.append(
+                mir.Call(
+                    type_=bool,
+                    func=declared_func.postcondition,
+                    args=[*args, return_value],
+                )
+            )
         return mir.FuncCall(
             type_=call.type_,
             func_name=mir.Ident(call.func),
@@ -356,12 +548,18 @@ class HirVisitor(Visitor):
         )
         return [pre, *body, post]
 
-    def visit_NamedExpr(self, expr: hir.NamedExpr):
-        rhs = self.visit(expr.rhs)
-        assign = self.visit(expr.assignment)
-        return mir.NamedExpr(rhs=rhs, assignment=assign, type_=expr.type_)
+    def visit_NamedExpr(self, expr: hir.NamedExpr, rhs: mir.Expr):
+        # `expr.rhs` is also the rhs of the assignment. Lowering it only once there
+        # and using the assigned variable as the value keeps calls in it from
+        # being checked twice, and nested assignment expressions linear in size
+        assign = self.assign(expr.assignment, rhs)
+        return mir.NamedExpr(rhs=assign.lhs, assignment=assign, type_=expr.type_)
 
 
-def lower_hir_to_mir(hir: hir.Module):
-    visitor = HirVisitor()
+def lower_hir_to_mir(
+    hir: hir.Module,
+    cache: typing.Optional[FunctionCache] = None,
+    statement_cache: typing.Optional[StatementCache] = None,
+):
+    visitor = HirVisitor(cache, statement_cache)
     return visitor.visit(hir)
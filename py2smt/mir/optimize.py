@@ -0,0 +1,204 @@
+"""
+    Constant propagation and folding on MIR.
+
+    MIR is in SSA form, so a variable that is assigned a constant on every path
+    has that value everywhere it is used. Such variables are replaced by their
+    value, and calls to predefined functions on constants are folded. Assertions
+    that fold to `true` are then discharged by `check` without calling the solver.
+"""
+import typing
+
+from py2smt.mir import types as mir
+from py2smt.mir.lower import PREDEFINED_FUNCTIONS
+from py2smt.visitor import Visitor
+
+VarKey = typing.Tuple[str, int, typing.Tuple[int, ...]]
+
+
+def _smt_divmod(a: int, b: int) -> typing.Tuple[int, int]:
+    """Integer division as in SMT-LIB: the remainder is never negative"""
+    r = a % abs(b)
+    return (a - r) // b, r
+
+
+def _fold_int(ident: str, args: typing.List[typing.Any]):
+    if ident == "+":
+        return sum(args)
+    elif ident == "-":
+        return -args[0] if len(args) == 1 else args[0] - sum(args[1:])
+    elif ident == "*":
+        result = 1
+        for arg in args:
+            result *= arg
+        return result
+    elif ident in ("div", "mod") and args[1] != 0:
+        return _smt_divmod(*args)[ident == "mod"]
+    elif ident == "=":
+        return all(arg == args[0] for arg in args[1:])
+    elif ident == "<":
+        return args[0] < args[1]
+    elif ident == "<=":
+        return args[0] <= args[1]
+    elif ident == ">":
+        return args[0] > args[1]
+    elif ident == ">=":
+        return args[0] >= args[1]
+    elif ident == "not":
+        return not args[0]
+    return None
+
+
+def is_true(expr: mir.Expr) -> bool:
+    return isinstance(expr, mir.Constant) and expr.value is True
+
+
+def is_false(expr: mir.Expr) -> bool:
+    return isinstance(expr, mir.Constant) and expr.value is False
+
+
+class MirOptimizer(Visitor):
+    # Operands of the calls, which are folded before them
+    OPERANDS = {mir.Call: lambda visitor, call: call.args}
+
+    def __init__(self):
+        # Values of the variables that are known to be constant
+        self.env: typing.Dict[VarKey, typing.Any] = {}
+        self.funcs: typing.Mapping[mir.FuncId, mir.Func] = {}
+        # Whether the path condition of the current statement is false
+        self.unreachable = False
+
+    def constant(self, type_: type, value: typing.Any) -> mir.Constant:
+        return mir.Constant(type_=type_, value=value)
+
+    def fold_condition(self, path_condition: typing.List[mir.Expr]):
+        """Fold the path condition of a statement, leaving out the parts that are
+        true. The path condition is `[false]` if any part of it is false"""
+        folded = [self.visit(cond) for cond in path_condition]
+        self.unreachable = any(is_false(cond) for cond in folded)
+        if self.unreachable:
+            return [self.constant(bool, False)]
+        return [cond for cond in folded if not is_true(cond)]
+
+    def visit_Module(self, module: mir.Module):
+        self.funcs = module.funcs
+        module.body = [self.visit(stmt) for stmt in module.body]
+        return module
+
+    def instantiate(self, func: mir.Func, args: typing.List[mir.Expr]):
+        """Fold the body of `func` with the constant `args`. Returns the constant
+        result, or `None` if it depends on the other arguments"""
+        env = {
+            (param.ident, param.version, tuple(param.scope)): arg.value
+            for param, arg in zip(func.args, args)
+            if isinstance(arg, mir.Constant)
+        }
+        if not env:
+            return None
+        env, self.env = self.env, env
+        result = self.visit(func.body)
+        self.env = env
+        return result if isinstance(result, mir.Constant) else None
+
+    def visit_FuncDef(self, funcdef: mir.FuncDef):
+        # Variables in functions have their own namespace
+        env, self.env = self.env, {}
+        funcdef.body = [self.visit(stmt) for stmt in funcdef.body]
+        self.env = env
+        return funcdef
+
+    def visit_Assign(self, assign: mir.Assign):
+        assign.path_condition = self.fold_condition(assign.path_condition)
+        assign.rhs = self.visit(assign.rhs)
+        lhs = assign.lhs
+        if (
+            not assign.path_condition
+            and isinstance(assign.rhs, mir.Constant)
+            # Return values of calls share their name, so they are not unique
+            and lhs.ident != "__return__"
+        ):
+            self.env[(lhs.ident, lhs.version, tuple(lhs.scope))] = assign.rhs.value
+        return assign
+
+    def visit_Assert(self, assertion: mir.Assert):
+        assertion.path_condition = self.fold_condition(assertion.path_condition)
+        assertion.test = self.visit(assertion.test)
+        if self.unreachable:
+            assertion.test = self.constant(bool, True)
+        return assertion
+
+    def visit_Assumption(self, assumption: mir.Assumption):
+        assumption.path_condition = self.fold_condition(assumption.path_condition)
+        assumption.expr = self.visit(assumption.expr)
+        return assumption
+
+    def visit_Var(self, var: mir.Var):
+        key = (var.ident, var.version, tuple(var.scope))
+        if key in self.env:
+            return self.constant(var.type_, self.env[key])
+        return var
+
+    def visit_Constant(self, constant: mir.Constant):
+        return constant
+
+    def visit_FuncCall(self, funccall: mir.FuncCall):
+        preconditions = [self.visit(cond) for cond in funccall.preconditions]
+        if funccall.preconditions:
+            preconditions = [cond for cond in preconditions if not is_true(cond)]
+            if self.unreachable or not preconditions:
+                # Keep the check, so that it is reported as proven
+                preconditions = [self.constant(bool, True)]
+        funccall.preconditions = preconditions
+        funccall.postconditions = [self.visit(cond) for cond in funccall.postconditions]
+        return funccall
+
+    def visit_NamedExpr(self, expr: mir.NamedExpr):
+        unreachable = self.unreachable
+        expr.assignment = self.visit(expr.assignment)
+        expr.rhs = self.visit(expr.rhs)
+        self.unreachable = unreachable
+        return expr
+
+    def visit_Call(self, call: mir.Call, *folded: mir.Expr):
+        args = list(folded)
+        func = PREDEFINED_FUNCTIONS.get(call.func)
+        if func is None:
+            template = self.funcs.get(call.func)
+            if template is not None and template.body is not None:
+                result = self.instantiate(template, args)
+                if result is not None:
+                    return result
+            return mir.Call(type_=call.type_, func=call.func, args=args)
+
+        if func.ident in ("and", "or"):
+            # A constant `absorbing` decides the result, the other constant is left out
+            absorbing = func.ident == "or"
+            if any(
+                isinstance(arg, mir.Constant) and arg.value is absorbing for arg in args
+            ):
+                return self.constant(call.type_, absorbing)
+            args = [
+                arg
+                for arg in args
+                if not (isinstance(arg, mir.Constant) and arg.value is not absorbing)
+            ]
+            if not args:
+                return self.constant(call.type_, not absorbing)
+            if len(args) == 1:
+                return args[0]
+        elif func.ident == "ite":
+            if isinstance(args[0], mir.Constant):
+                return args[1] if args[0].value else args[2]
+        elif args and all(
+            # Reals are left to the solver, to not lose precision
+            isinstance(arg, mir.Constant) and isinstance(arg.value, int)
+            for arg in args
+        ):
+            value = _fold_int(func.ident, [arg.value for arg in args])
+            if value is not None:
+                return self.constant(call.type_, value)
+        return mir.Call(type_=call.type_, func=call.func, args=args)
+
+
+def optimize_mir(module: mir.Module) -> mir.Module:
+    """Propagate constants through `module` and fold calls on them, in place"""
+    return MirOptimizer().visit(module)
@@ -5,20 +5,18 @@ from dataclasses import dataclass, field
 Ident = typing.NewType("Ident", str)
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
-    ast_node: typing.Optional[ast.AST] = field(compare=False, init=False)
+    # The AST node the node was lowered from, set after it is constructed
+    ast_node: typing.Optional[ast.AST] = field(default=None, compare=False, init=False)
 
-    def __post_init__(self):
-        self.ast_node = None
 
-
-@dataclass
+@dataclass(slots=True)
 class Expr(Node):
     type_: type
 
 
-@dataclass
+@dataclass(slots=True)
 class Var(Expr):
     ident: Ident
     version: int
@@ -28,62 +26,74 @@ class Var(Expr):
 FuncId = typing.NewType("FuncId", int)
 
 
-@dataclass
+@dataclass(slots=True)
 class Func:
     id: FuncId
     ident: Ident
     args: typing.List[Var] = field(default_factory=list)
+    # Defines the result of the function in terms of `args`. Predefined functions
+    # have no body
+    body: typing.Optional[Expr] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Call(Expr):
     func: FuncId
     args: typing.List[Expr]
 
 
-@dataclass
+@dataclass(slots=True)
 class Stmt(Node):
     path_condition: typing.List[Expr]
 
 
-@dataclass
+@dataclass(slots=True)
 class Assumption(Stmt):
     expr: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class Assert(Stmt):
     test: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class Assign(Stmt):
     lhs: Var
     rhs: Expr
 
 
-@dataclass
+@dataclass(slots=True)
 class Constant(Expr):
     value: typing.Any
 
 
-@dataclass
+@dataclass(slots=True)
 class Module(Node):
     vars: typing.List[Var]
     body: typing.List[Stmt]
     funcs: typing.Mapping[FuncId, Func]
+    # First and last line and `StatementCache` key of the top-level statements,
+    # if lowered with a statement cache
+    statement_keys: typing.List[typing.Tuple[int, int, str]] = field(
+        default_factory=list
+    )
 
 
-@dataclass
+@dataclass(slots=True)
 class FuncDef(Stmt):
     name: Ident
 
     ret_type: type
     variables: typing.List[Var]
     body: typing.List[Stmt]
+    # Key of this function in the `FunctionCache`, if caching is enabled
+    cache_key: typing.Optional[str] = None
+    # Whether this function was verified by an earlier run. If so, its body is not lowered
+    verified: bool = False
 
 
-@dataclass
+@dataclass(slots=True)
 class FuncCall(Expr):
     func_name: Ident
     preconditions: typing.List[Expr]
@@ -91,14 +101,14 @@ class FuncCall(Expr):
     return_value: Var
 
 
-@dataclass
+@dataclass(slots=True)
 class Loop(Stmt):
     invariants: typing.List[Expr]
     test: Expr
     body: typing.List[Stmt]
 
 
-@dataclass
+@dataclass(slots=True)
 class NamedExpr(Expr):
     assignment: Assign
     rhs: Expr
@@ -0,0 +1,149 @@
+"""
+    Portfolios of solver strategies.
+
+    How fast a query is solved depends a lot on the solver configuration,
+    especially for nonlinear arithmetic. A portfolio either races several
+    strategies on a query, each in its own process, and takes the first
+    definitive answer, or escalates through them in order, from cheap strategies
+    with a short timeout to heavier ones.
+"""
+import argparse
+import multiprocessing
+import typing
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+
+import z3  # type: ignore
+
+
+def _legacy_arith() -> z3.Solver:
+    solver = z3.SimpleSolver()
+    solver.set("arith.solver", 2)
+    return solver
+
+
+STRATEGIES: typing.Dict[str, typing.Callable[[], z3.Solver]] = {
+    # The incremental solver that is used without a portfolio
+    "simple": z3.SimpleSolver,
+    # The solver z3 configures for the logic of the query
+    "smt": z3.Solver,
+    # Tactics for nonlinear integer arithmetic
+    "nia": lambda: z3.Then(
+        "simplify", "propagate-values", "solve-eqs", "qfnia"
+    ).solver(),
+    # The previous arithmetic solver, which is faster on some nonlinear queries
+    "legacy_arith": _legacy_arith,
+    # Nonlinear integer arithmetic as bit-vectors of limited size, which only
+    # finds counterexamples
+    "nla2bv": lambda: z3.Then("simplify", "nla2bv", "smt").solver(),
+}
+
+# Results that settle a query
+DEFINITIVE = {"sat", "unsat"}
+
+
+@dataclass
+class Strategy:
+    name: str
+    # Seconds the strategy may spend on a query, within the limits of the check
+    timeout: typing.Optional[float] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "Strategy":
+        """Parse a strategy given as `name` or `name:seconds`"""
+        name, _, timeout = spec.partition(":")
+        if name not in STRATEGIES:
+            raise ValueError(
+                f"Unknown strategy {name!r}, expected one of {', '.join(STRATEGIES)}"
+            )
+        return cls(name, float(timeout) if timeout else None)
+
+    def new_solver(self, max_memory: typing.Optional[int] = None) -> z3.Solver:
+        solver = STRATEGIES[self.name]()
+        if max_memory is not None:
+            solver.set("max_memory", max_memory)
+        return solver
+
+    def query_timeout(self, timeout: typing.Optional[float]) -> typing.Optional[float]:
+        """The timeout of this strategy within the `timeout` of the query"""
+        if self.timeout is None:
+            return timeout
+        return self.timeout if timeout is None else min(self.timeout, timeout)
+
+
+def parse_strategies(specs: typing.Iterable[str]) -> typing.List[Strategy]:
+    return [Strategy.parse(spec) for spec in specs]
+
+
+def strategy_list(value: str) -> typing.List[str]:
+    """The comma-separated strategies of a command line option, validated"""
+    specs = value.split(",")
+    try:
+        parse_strategies(specs)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+    return specs
+
+
+# Solves a query, returning the result and the outcome
+Attempt = typing.Callable[[], typing.Tuple[str, typing.Any]]
+Results = typing.Dict[int, typing.Tuple[str, typing.Any]]
+
+
+def _run_attempt(attempt: Attempt, connection):
+    connection.send(attempt())
+    connection.close()
+
+
+def race(
+    attempts: typing.Sequence[Attempt],
+) -> typing.Tuple[typing.Optional[int], Results]:
+    """Run each of the `attempts` in a forked process. Returns the index of the
+    first attempt with a definitive result, after killing the others, and the
+    results of the attempts that finished by their index"""
+    context = multiprocessing.get_context("fork")
+    processes = []
+    pending = {}
+    for idx, attempt in enumerate(attempts):
+        reader, writer = context.Pipe(duplex=False)
+        process = context.Process(target=_run_attempt, args=(attempt, writer))
+        process.start()
+        writer.close()
+        processes.append(process)
+        pending[reader] = idx
+
+    results: Results = {}
+    winner = None
+    try:
+        while pending and winner is None:
+            for reader in wait(list(pending)):
+                idx = pending.pop(reader)
+                try:
+                    result = reader.recv()
+                except EOFError:
+                    # The process died, e.g. because it ran out of memory
+                    processes[idx].join()
+                    result = ("unknown", f"exited with code {processes[idx].exitcode}")
+                results[idx] = result
+                if result[0] in DEFINITIVE:
+                    winner = idx
+                    break
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+            process.join()
+    return winner, results
+
+
+def escalate(
+    attempts: typing.Sequence[Attempt],
+) -> typing.Tuple[typing.Optional[int], Results]:
+    """Like `race`, but runs the attempts in order in this process, until one has
+    a definitive result"""
+    results: Results = {}
+    for idx, attempt in enumerate(attempts):
+        results[idx] = attempt()
+        if results[idx][0] in DEFINITIVE:
+            return idx, results
+    return None, results
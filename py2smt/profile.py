@@ -0,0 +1,97 @@
+"""
+    Timing of the phases of a check and of the individual solver queries
+"""
+import time
+import tracemalloc
+import typing
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+
+@dataclass
+class QueryTiming:
+    # Index of the validity scope in the program
+    index: int
+    ctx_name: str
+    lineno: typing.Optional[int]
+    result: str
+    seconds: float
+    # The solver strategy that decided the query, if solved with a portfolio
+    strategy: typing.Optional[str] = None
+    # The SMT-LIB logic the query was solved in
+    logic: typing.Optional[str] = None
+
+
+@dataclass
+class Profile:
+    # Seconds spent per phase, in the order the phases ran
+    phases: typing.Dict[str, float] = field(default_factory=dict)
+    queries: typing.List[QueryTiming] = field(default_factory=list)
+    # Peak memory allocated by python per phase in bytes, if tracing memory.
+    # Tracing slows down the phases, so their timings are less accurate.
+    trace_memory: bool = False
+    peak_memory: typing.Dict[str, int] = field(default_factory=dict)
+    # Memory blocks allocated by python per phase that are still alive at its
+    # end, about one per object, and their size in bytes, if tracing memory
+    live_objects: typing.Dict[str, int] = field(default_factory=dict)
+    retained_memory: typing.Dict[str, int] = field(default_factory=dict)
+
+    @contextmanager
+    def phase(self, name: str):
+        if self.trace_memory:
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                self.peak_memory[name] = max(self.peak_memory.get(name, 0), peak)
+                self.retained_memory[name] = current
+                self.live_objects[name] = len(tracemalloc.take_snapshot().traces)
+                tracemalloc.stop()
+
+    def add_query(
+        self,
+        index: int,
+        scope,
+        result: str,
+        seconds: float,
+        strategy: typing.Optional[str] = None,
+        logic: typing.Optional[str] = None,
+    ):
+        lineno = scope.ast_node.lineno if scope.ast_node else None
+        self.queries.append(
+            QueryTiming(
+                index=index,
+                ctx_name=scope.ctx_name,
+                lineno=lineno,
+                result=result,
+                seconds=seconds,
+                strategy=strategy,
+                logic=logic,
+            )
+        )
+
+    def format_table(self, filename: str = "<input>") -> typing.List[str]:
+        """Format the phases in order and the queries from slowest to fastest"""
+        total = sum(self.phases.values()) or 1.0
+        lines = [f"{'Phase':<20} {'Seconds':>10} {'%':>6}"]
+        for name, seconds in self.phases.items():
+            lines.append(f"{name:<20} {seconds:>10.4f} {100 * seconds / total:>6.1f}")
+
+        lines.append("")
+        lines.append(
+            f"{'Seconds':>10} {'Result':<8} {'Logic':<8} {'Context':<20} Location"
+        )
+        for query in sorted(self.queries, key=lambda q: (-q.seconds, q.index)):
+            line = (
+                f"{query.seconds:>10.4f} {query.result:<8} {query.logic or '-':<8} "
+                f"{query.ctx_name:<20} {filename}:{query.lineno}"
+            )
+            if query.strategy is not None:
+                line += f" ({query.strategy})"
+            lines.append(line)
+        return lines
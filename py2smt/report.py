@@ -0,0 +1,79 @@
+"""
+    Formatting of failed checks as tracebacks and as JSON-able records
+"""
+import ast
+import traceback as tb
+import typing
+
+from py2smt.check import CheckFailed, CheckFailures, CheckUnknown
+
+
+def format_failure(filename, source_code, exc):
+    frames = []
+    model = exc.model
+    ctx = exc.context
+    for val, var in model:
+        # Variables introduced during lowering, like merges of branches,
+        # have no source location
+        if var.ast_node is None:
+            continue
+        var_name = ast.get_source_segment(source_code, var.ast_node)
+        frames.append(
+            tb.FrameSummary(
+                filename=filename,
+                lineno=var.ast_node.lineno,
+                name=ctx.ctx_name,
+                locals={var_name: val},
+            )
+        )
+    context_lines = tb.format_list(frames)
+    failing_assert = tb.format_list(
+        [
+            tb.FrameSummary(
+                filename=filename, lineno=ctx.ast_node.lineno, name=ctx.ctx_name
+            )
+        ]
+    )
+
+    if isinstance(exc, CheckUnknown):
+        return [f"The following assert is unknown ({exc.reason}):", *failing_assert]
+    return ["The following assert fails:", *failing_assert, "When:", *context_lines]
+
+
+def format_counterexample(filename, source_code, exc):
+    if not isinstance(exc, CheckFailures):
+        return format_failure(filename, source_code, exc)
+
+    unknown = sum(isinstance(failure, CheckUnknown) for failure in exc.failures)
+    lines = [f"{len(exc.failures) - unknown} asserts fail"]
+    if unknown:
+        lines[0] += f", {unknown} are unknown"
+    for failure in exc.failures:
+        lines.extend(format_failure(filename, source_code, failure))
+    return lines
+
+
+def failure_records(source_code: str, exc: CheckFailed) -> typing.List[dict]:
+    """The failures in `exc` as JSON-able dicts with the failing assert, whether
+    it fails or is unknown and the values of the variables in its counterexample.
+    Values that are not booleans or integers, like fractions, are given as
+    strings"""
+    failures = exc.failures if isinstance(exc, CheckFailures) else [exc]
+    return [
+        {
+            "context": failure.context.ctx_name,
+            "lineno": failure.context.ast_node.lineno,
+            "verdict": "unknown" if isinstance(failure, CheckUnknown) else "failed",
+            "reason": getattr(failure, "reason", None),
+            "values": [
+                {
+                    "name": ast.get_source_segment(source_code, var.ast_node),
+                    "lineno": var.ast_node.lineno,
+                    "value": val if isinstance(val, (bool, int)) else str(val),
+                }
+                for val, var in failure.model
+                if var.ast_node is not None
+            ],
+        }
+        for failure in failures
+    ]
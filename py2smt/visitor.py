@@ -1,4 +1,33 @@
+import typing
+
+
 class Visitor:
+    """Calls the `visit_` method for the type of each node.
+
+    The nodes of the types in `OPERANDS` are visited after their operands, with
+    a stack rather than recursion, so deeply nested expressions do not exhaust
+    the Python stack. `OPERANDS` gives the operands of such a node, and its
+    `visit_` method gets their results as extra arguments."""
+
+    OPERANDS: typing.Dict[
+        type, typing.Callable[[typing.Any, typing.Any], typing.Sequence]
+    ] = {}
+    # The `visit_` method of each node type, looked up once per visitor class
+    _methods: typing.Dict[type, typing.Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._methods = {}
+
+    @classmethod
+    def method(cls, node_type: type) -> typing.Callable:
+        try:
+            return cls._methods[node_type]
+        except KeyError:
+            method = getattr(cls, f"visit_{node_type.__name__}")
+            cls._methods[node_type] = method
+            return method
+
     def add_ast(self, node, ast_node):
         if isinstance(node, list):
             for n in node:
@@ -7,7 +36,42 @@ class Visitor:
             node.ast_node = ast_node
 
     def visit(self, node):
-        ast_node = node.ast_node
-        result = getattr(self, f"visit_{type(node).__name__}")(node)
-        self.add_ast(result, ast_node)
+        node_type = type(node)
+        if node_type in self.OPERANDS:
+            return self.visit_tree(node)
+        method = self._methods.get(node_type) or self.method(node_type)
+        result = method(self, node)
+        self.add_ast(result, node.ast_node)
         return result
+
+    def visit_tree(self, root):
+        """Visit `root`, and before each node in it of a type in `OPERANDS`, its
+        operands"""
+        operands_of, methods = self.OPERANDS, self._methods
+        # Nodes to visit, with the number of their operands once those are done
+        stack: typing.List[typing.Tuple[typing.Any, int]] = [(root, -1)]
+        results: typing.List[typing.Any] = []
+        while stack:
+            node, arity = stack.pop()
+            node_type = type(node)
+            if arity < 0:
+                operands = operands_of.get(node_type)
+                if operands is not None:
+                    children = operands(self, node)
+                    if any(type(child) in operands_of for child in children):
+                        stack.append((node, len(children)))
+                        stack.extend([(child, -1) for child in reversed(children)])
+                        continue
+                    # Only leaves, which are visited right away
+                    arity = len(children)
+                    results.extend([self.visit(child) for child in children])
+            method = methods.get(node_type) or self.method(node_type)
+            if arity > 0:
+                args = results[-arity:]
+                del results[-arity:]
+                result = method(self, node, *args)
+            else:
+                result = method(self, node)
+            self.add_ast(result, node.ast_node)
+            results.append(result)
+        return results[0]
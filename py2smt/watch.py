@@ -0,0 +1,175 @@
+"""
+    Watch mode, which verifies files again whenever they change.
+
+    The checks share a function, a statement and a verdict cache, so after an edit
+    only the functions whose definition or callee contracts changed are verified
+    again, and only the module-level asserts in or after a changed top-level
+    statement or function contract are solved again. Each check runs in its own
+    process, which is killed when the file changes again before it is done.
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+import typing
+from multiprocessing.connection import Connection, wait
+
+from py2smt.batch import FileResult, collect_files, verify_file
+from py2smt.cache import FunctionCache, StatementCache, VerdictCache
+
+
+def _stat(filename: str) -> typing.Optional[typing.Tuple[int, int]]:
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _verify(filename: str, options: dict, connection: Connection):
+    connection.send(verify_file(filename, **options))
+    connection.close()
+
+
+class Watcher:
+    """Verifies the files in `paths`, and every file again after it changed.
+    `options` are the fields of `CheckOptions`, without the caches"""
+
+    def __init__(
+        self,
+        paths: typing.Sequence[str],
+        cache_dir: str,
+        interval: float = 0.5,
+        cache_size: int = 4096,
+        **options,
+    ):
+        self.paths = paths
+        self.interval = interval
+        self.options = dict(
+            options,
+            cache=FunctionCache(cache_dir, cache_size),
+            statement_cache=StatementCache(cache_dir, cache_size),
+            verdict_cache=VerdictCache(cache_dir, cache_size),
+        )
+        self.context = multiprocessing.get_context("fork")
+        # Modification time and size of the files when they were last seen
+        self.seen: typing.Dict[str, typing.Optional[typing.Tuple[int, int]]] = {}
+        # Files that changed and were not checked since, in order
+        self.pending: typing.List[str] = []
+        self.running: typing.Optional[
+            typing.Tuple[str, multiprocessing.Process, Connection]
+        ] = None
+        # Files whose check was cancelled because they changed again
+        self.cancelled: typing.List[str] = []
+
+    def poll(self):
+        """Queue the files that changed since they were last seen, cancelling the
+        check of a file that changed while it was checked"""
+        for filename in collect_files(self.paths):
+            stat = _stat(filename)
+            if filename in self.seen and self.seen[filename] == stat:
+                continue
+            self.seen[filename] = stat
+            if stat is None:
+                continue
+            if self.running is not None and self.running[0] == filename:
+                self.cancel()
+            if filename not in self.pending:
+                self.pending.append(filename)
+
+    def start(self):
+        filename = self.pending.pop(0)
+        reader, writer = self.context.Pipe(duplex=False)
+        process = self.context.Process(
+            target=_verify, args=(filename, self.options, writer)
+        )
+        process.start()
+        writer.close()
+        self.running = (filename, process, reader)
+
+    def cancel(self):
+        assert self.running is not None
+        filename, process, reader = self.running
+        process.kill()
+        process.join()
+        reader.close()
+        self.running = None
+        self.cancelled.append(filename)
+
+    def finish(self) -> FileResult:
+        assert self.running is not None
+        filename, process, reader = self.running
+        try:
+            result = reader.recv()
+        except EOFError:
+            # The process died, e.g. because it ran out of memory
+            process.join()
+            result = FileResult(
+                filename,
+                "error",
+                0.0,
+                output=[f"The check exited with code {process.exitcode}"],
+            )
+        process.join()
+        reader.close()
+        self.running = None
+        return result
+
+    def step(self) -> typing.Optional[FileResult]:
+        """Poll the files, start the next check if none is running, and wait up
+        to `interval` seconds for the running check. Returns its result if it
+        finished"""
+        self.poll()
+        if self.running is None and self.pending:
+            self.start()
+        if self.running is None:
+            time.sleep(self.interval)
+            return None
+        if wait([self.running[2]], self.interval):
+            return self.finish()
+        return None
+
+    def close(self):
+        if self.running is not None:
+            self.cancel()
+
+
+def format_result(result: FileResult) -> typing.List[str]:
+    lines = []
+    if result.status == "error":
+        lines.append(f"Could not verify {result.filename}:")
+    lines.extend(result.output)
+    lines.append(
+        f"{result.filename}: {result.status}, solved {len(result.profile.queries)} "
+        f"queries in {result.seconds:.2f} seconds"
+    )
+    return lines
+
+
+def watch(
+    paths: typing.Sequence[str],
+    cache_dir: typing.Optional[str] = None,
+    interval: float = 0.5,
+    cache_size: int = 4096,
+    profile: bool = False,
+    **options,
+):
+    """Verify the files in `paths` whenever they change, printing the results,
+    until interrupted. Without a `cache_dir`, the caches only last as long as
+    the watch"""
+    with tempfile.TemporaryDirectory(prefix="py2smt-watch-") as tmp_dir:
+        watcher = Watcher(paths, cache_dir or tmp_dir, interval, cache_size, **options)
+        try:
+            while True:
+                result = watcher.step()
+                for filename in watcher.cancelled:
+                    print(f"{filename} changed, checking it again", flush=True)
+                watcher.cancelled.clear()
+                if result is not None:
+                    print("\n".join(format_result(result)), flush=True)
+                    if profile:
+                        print("\n".join(result.profile.format_table(result.filename)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
@@ -0,0 +1,19 @@
+from py2smt import __return__, assumes, ensures, param
+
+
+@assumes(param.a < param.b)
+@ensures(__return__ >= param.a, __return__ <= param.b)
+@ensures((__return__ == param.c or __return__ == param.a) or __return__ == param.b)
+def clamp(a: int, b: int, c: int) -> int:
+    if c < a:
+        ret = a
+    elif c > b:
+        ret = b
+    else:
+        ret = c
+    return ret
+
+
+# The contract of the outer call allows 4 as well, as that is its `b`
+res = clamp(0, 4, clamp(-2, 3, 18))
+assert res >= 0 and res <= 3
@@ -0,0 +1,22 @@
+from py2smt import __return__, assumes, ensures, param
+
+
+@ensures(__return__ >= param.a)
+def at_least(a: int) -> int:
+    return a + 1
+
+
+@assumes(param.a > 0)
+@ensures(__return__ > 0)
+def pos(a: int) -> int:
+    return a
+
+
+# The precondition of `pos` only has to hold when the branch is taken
+b = at_least(-5)
+r = 1
+s = 1
+if b > 0:
+    r = pos(b)
+    s = (t := pos(b)) + 1
+assert r > 0 and s > 0
@@ -0,0 +1,16 @@
+a = 0
+b = 5
+if a > 0:
+    assert a > 0
+    if b > 3:
+        assert a > 0 and b > 3
+        c = a
+    else:
+        c = b
+elif b > 3:
+    assert a <= 0
+    c = b
+else:
+    c = 0
+
+assert c == 5
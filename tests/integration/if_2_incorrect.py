@@ -0,0 +1,9 @@
+a = 0
+b = 5
+if a > 0:
+    c = a
+elif b > 3:
+    assert b > 5
+    c = b
+else:
+    c = 0
@@ -0,0 +1,7 @@
+x = 0
+a = 0
+if x == 0:
+    b = 1
+else:
+    a = 5
+assert a == 5
@@ -0,0 +1,12 @@
+from py2smt import __return__, assumes, ensures, param
+
+
+def test_decorators_return_function():
+    def clamp(a: int, b: int, c: int) -> int:
+        return max(a, min(b, c))
+
+    decorated = assumes(param.a < param.b)(
+        ensures(__return__ >= param.a, 0 <= -param.c + 1)(clamp)
+    )
+    assert decorated is clamp
+    assert decorated(0, 4, 6) == 4
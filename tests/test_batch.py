@@ -0,0 +1,90 @@
+import json
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from py2smt.__main__ import main
+from py2smt.batch import collect_files, verify_files, write_json, write_junit
+
+CORRECT = "a = 1\nassert a == 1\n"
+INCORRECT = "a = 1\nassert a == 2\n"
+INVALID = "a = 1.5 +\n"
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "b.py").write_text(INCORRECT)
+    (tmp_path / "a.py").write_text(CORRECT)
+    (tmp_path / "c.py").write_text(INVALID)
+    (tmp_path / "notes.txt").write_text("not python")
+    return tmp_path
+
+
+def test_collect_files(corpus):
+    assert collect_files([str(corpus / "c.py"), str(corpus)]) == [
+        str(corpus / "c.py"),
+        str(corpus / "a.py"),
+        str(corpus / "c.py"),
+        str(corpus / "sub" / "b.py"),
+    ]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_verify_integration_files(jobs):
+    filenames = collect_files(["tests/integration"])
+    results = verify_files(filenames, jobs=jobs)
+    assert [result.filename for result in results] == filenames
+    assert [result.status for result in results] == [
+        "failed" if filename.endswith("incorrect.py") else "ok"
+        for filename in filenames
+    ]
+
+
+def test_summaries(corpus, tmp_path):
+    results = verify_files(collect_files([str(corpus)]), jobs=2)
+    assert [result.status for result in results] == ["ok", "error", "failed"]
+
+    with open(tmp_path / "results.json", "w") as file:
+        write_json(results, file)
+    data = json.loads((tmp_path / "results.json").read_text())
+    assert data["summary"]["files"] == 3
+    assert [file["status"] for file in data["files"]] == ["ok", "error", "failed"]
+    assert data["files"][2]["failures"][0]["lineno"] == 2
+    assert "solve" in data["files"][0]["phases"]
+
+    with open(tmp_path / "results.xml", "w") as file:
+        write_junit(results, file)
+    suite = ET.parse(tmp_path / "results.xml").getroot().find("testsuite")
+    assert (suite.get("tests"), suite.get("failures"), suite.get("errors")) == (
+        "3",
+        "1",
+        "1",
+    )
+    cases = suite.findall("testcase")
+    assert [case.find("error") is not None for case in cases] == [False, True, False]
+    assert [case.find("failure") is not None for case in cases] == [False, False, True]
+
+
+def test_exit_code(corpus, capsys):
+    assert main([str(corpus / "a.py")]) == 0
+    assert main([str(corpus / "a.py"), str(corpus / "sub")]) == 1
+    capsys.readouterr()
+    assert main(["--jobs", "2", str(corpus)]) == 1
+    output = capsys.readouterr().out
+    assert output.index("c.py") < output.index("b.py")
+
+
+def test_unknown(tmp_path, capsys):
+    path = tmp_path / "fermat.py"
+    path.write_text(
+        "@assumes(param.x > 0, param.y > 0, param.z > 0)\n"
+        "def fermat(x: int, y: int, z: int) -> int:\n"
+        "    assert x * x * x + y * y * y != z * z * z\n"
+        "    return 0\n"
+    )
+    assert main(["--timeout", "0.2", str(path)]) == 1
+    output = capsys.readouterr().out
+    assert output.startswith("The following assert is unknown (timeout):")
+    assert f'"{path}", line 3' in output
+    assert verify_files([str(path)], timeout=0.2)[0].status == "unknown"
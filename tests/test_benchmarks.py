@@ -0,0 +1,34 @@
+import pytest
+
+from benchmarks import memory
+from benchmarks.generators import CASES
+from benchmarks.imports import VERIFICATION_MODULES, import_profile
+from benchmarks.incremental import compare
+from py2smt.check import check
+
+
+@pytest.mark.parametrize("case", CASES)
+@pytest.mark.parametrize("size", [1, 3])
+def test_generated_programs_verify(case, size):
+    check(CASES[case](size))
+
+
+def test_import_loads_no_verification_modules():
+    loaded = import_profile()["modules"]
+    assert [name for name in VERIFICATION_MODULES if name in loaded] == []
+
+
+def test_incremental_benchmark():
+    result = compare("many_asserts", 5)
+    assert result["queries"] == 4
+    assert result["push/pop"] > 0 and result["literals"] > 0
+
+
+def test_memory_benchmark():
+    rows = memory.measure("straight_line", 10)
+    assert [row["phase"] for row in rows][:3] == [
+        "parse",
+        "lower_ast_to_hir",
+        "lower_hir_to_mir",
+    ]
+    assert all(row["peak"] >= row["retained"] for row in rows)
@@ -0,0 +1,159 @@
+import os
+
+import pytest
+
+from py2smt.cache import DiskCache, FunctionCache, StatementCache, VerdictCache
+from py2smt.check import CheckFailed, check, lower
+
+PROGRAM = """
+@assumes(param.a > 0)
+@ensures(__return__ == 2 * param.a)
+def double(a: int) -> int:
+    return a * 2
+
+assert double(2) == 4
+"""
+
+
+def function_scopes(text: str, cache: FunctionCache):
+    _, model = lower(text, cache)
+    return [stmt for stmt in model.body if getattr(stmt, "ctx_name", None) == "double"]
+
+
+def test_skip_verified_function(tmp_path):
+    cache = FunctionCache(tmp_path)
+    assert function_scopes(PROGRAM, cache)
+
+    check(PROGRAM, cache=cache)
+    assert function_scopes(PROGRAM, cache) == []
+
+
+def test_failed_function_not_cached(tmp_path):
+    cache = FunctionCache(tmp_path)
+    program = PROGRAM.replace("a * 2", "a * 3")
+    with pytest.raises(CheckFailed):
+        check(program, cache=cache)
+    with pytest.raises(CheckFailed):
+        check(program, cache=cache)
+
+
+def test_changed_contract_invalidates(tmp_path):
+    cache = FunctionCache(tmp_path)
+    check(PROGRAM, cache=cache)
+
+    program = PROGRAM.replace("2 * param.a", "3 * param.a")
+    assert function_scopes(program, cache)
+    with pytest.raises(CheckFailed):
+        check(program, cache=cache)
+
+
+def test_lru_eviction(tmp_path):
+    cache = DiskCache(tmp_path, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    os.utime(tmp_path / "a", (0, 0))
+    os.utime(tmp_path / "b", (1, 1))
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_put_counts_entries(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path, max_entries=10)
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scans.append(path) or scandir(path))
+    for idx in range(10):
+        cache.put(f"key{idx}", idx)
+    cache.put("key0", 0)
+    # Only counted on the first write
+    assert len(scans) == 1
+    cache.put("key10", 10)
+    assert len(scans) == 2
+    assert len(os.listdir(tmp_path)) == 10
+
+
+MODULE = """
+@ensures(__return__ == param.a + 1)
+def inc(a: int) -> int:
+    return a + 1
+
+x = inc(1)
+assert x == 2
+y = x + 1
+assert y == 3
+"""
+
+
+def solved_lines(text: str, tmp_path):
+    caches = dict(
+        cache=FunctionCache(tmp_path), statement_cache=StatementCache(tmp_path)
+    )
+    return [query.lineno for query in check(text, **caches).queries]
+
+
+def test_skip_verified_statements(tmp_path):
+    assert solved_lines(MODULE, tmp_path) == [2, 7, 9]
+    assert solved_lines(MODULE, tmp_path) == []
+    # Only the statements from the change on are solved again
+    assert solved_lines(MODULE.replace("y = x + 1", "y = 1 + x"), tmp_path) == [9]
+
+
+def test_verified_statements_not_stored_again(tmp_path, monkeypatch):
+    solved_lines(MODULE, tmp_path)
+    stored = []
+    monkeypatch.setattr(
+        DiskCache, "put_many", lambda cache, items: stored.append(items)
+    )
+    solved_lines(MODULE, tmp_path)
+    assert stored == [{}]
+
+
+def test_changed_contract_invalidates_statements(tmp_path):
+    solved_lines(MODULE, tmp_path)
+    program = MODULE.replace("param.a + 1)", "param.a + 1, __return__ > param.a)")
+    assert solved_lines(program, tmp_path) == [2, 7, 9]
+
+
+def test_failed_statement_not_cached(tmp_path):
+    program = MODULE.replace("y == 3", "y == 4")
+    caches = dict(
+        cache=FunctionCache(tmp_path), statement_cache=StatementCache(tmp_path)
+    )
+    for _ in range(2):
+        with pytest.raises(CheckFailed) as exc_info:
+            check(program, **caches)
+        assert exc_info.value.context.ast_node.lineno == 9
+
+
+def query_results(text: str, tmp_path, **options):
+    profile = check(text, verdict_cache=VerdictCache(tmp_path), **options)
+    return [query.result for query in profile.queries]
+
+
+def test_cached_verdicts(tmp_path):
+    assert query_results(MODULE, tmp_path, optimize=False) == ["unsat"] * 3
+    assert query_results(MODULE, tmp_path, optimize=False) == ["cached"] * 3
+    # The same queries up to the names of identifiers
+    renamed = MODULE.replace("x", "u").replace("y", "v")
+    assert query_results(renamed, tmp_path, optimize=False) == ["cached"] * 3
+
+
+def test_verdicts_by_solver(tmp_path):
+    query_results(MODULE, tmp_path, optimize=False)
+    results = query_results(MODULE, tmp_path, optimize=False, slice=True)
+    assert "cached" not in results
+    results = query_results(MODULE, tmp_path, optimize=False, portfolio=["smt"])
+    assert "cached" not in results
+
+
+def test_cached_counterexample(tmp_path):
+    program = MODULE.replace("y == 3", "y == 4")
+    # The second check knows the query is sat, and solves it for the model
+    for _ in range(2):
+        with pytest.raises(CheckFailed) as exc_info:
+            check(program, optimize=False, verdict_cache=VerdictCache(tmp_path))
+        assert exc_info.value.context.ast_node.lineno == 9
+        assert exc_info.value.model
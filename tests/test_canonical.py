@@ -0,0 +1,33 @@
+from py2smt.check import lower
+from py2smt.lir import DependencyIndex, query_digest
+
+PROGRAM = """
+@ensures(__return__ == param.a + 1)
+def inc(a: int) -> int:
+    return a + 1
+
+x = inc(1)
+y = x + 2
+assert y == 4
+"""
+
+
+def digests(program: str):
+    _, model = lower(program, optimize=False)
+    return [query_digest(query) for query in DependencyIndex(model).queries()]
+
+
+def test_renamed_program():
+    renamed = PROGRAM.replace("x", "first").replace("y", "second")
+    assert digests(renamed) == digests(PROGRAM)
+
+
+def test_unrelated_calls():
+    # The extra call shifts the `!call_N!` prefixes of the calls after it
+    program = PROGRAM.replace("x = inc(1)", "z = inc(5)\nx = inc(1)")
+    assert digests(program)[-1] == digests(PROGRAM)[-1]
+
+
+def test_changed_query():
+    assert digests(PROGRAM.replace("y == 4", "y == 5")) != digests(PROGRAM)
+    assert digests(PROGRAM.replace("x + 2", "2 + x")) != digests(PROGRAM)
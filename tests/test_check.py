@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from py2smt.check import CheckFailed, CheckFailures, CheckUnknown, check
+
+PROGRAM = """
+a = 1
+assert a == 2
+b = 3
+assert b == 4
+assert a == 1
+"""
+
+
+def failing_lines(exc: CheckFailed):
+    failures = exc.failures if isinstance(exc, CheckFailures) else [exc]
+    return [failure.context.ast_node.lineno for failure in failures]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_first_failure(jobs):
+    with pytest.raises(CheckFailed) as exc_info:
+        check(PROGRAM, jobs=jobs)
+    assert failing_lines(exc_info.value) == [3]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_fail_fast(jobs):
+    with pytest.raises(CheckFailed) as exc_info:
+        check(PROGRAM, jobs=jobs, fail_fast=True)
+    assert failing_lines(exc_info.value) == [3]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_all_failures(jobs):
+    with pytest.raises(CheckFailures) as exc_info:
+        check(PROGRAM, jobs=jobs, all_failures=True)
+    assert failing_lines(exc_info.value) == [3, 5]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_assumption_literals(jobs):
+    with pytest.raises(CheckFailures) as exc_info:
+        check(PROGRAM, jobs=jobs, all_failures=True, assumption_literals=True)
+    assert failing_lines(exc_info.value) == [3, 5]
+    # The literals are not part of the counterexamples
+    idents = [var.ident.ident for _, var in exc_info.value.failures[1].model]
+    assert idents == ["a$0$0", "b$0$0"]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_profile(jobs):
+    profile = check("a = 1\nassert a == 1\nassert a > 0", jobs=jobs)
+    assert list(profile.phases) == [
+        "parse",
+        "lower_ast_to_hir",
+        "lower_hir_to_mir",
+        "optimize_mir",
+        "lower_mir_to_lir",
+        "share_subterms",
+        "infer_logic",
+        "solve",
+    ]
+    assert [(q.ctx_name, q.lineno, q.result) for q in profile.queries] == [
+        ("__main__", 2, "proven"),
+        ("__main__", 3, "proven"),
+    ]
+
+
+# Fermat's last theorem for cubes, which z3 does not prove
+UNDECIDED = """
+@assumes(param.x > 0, param.y > 0, param.z > 0)
+def fermat(x: int, y: int, z: int) -> int:
+    assert x * x * x + y * y * y != z * z * z
+    assert x + y != z
+    assert x * x * x * x + y * y * y * y != z * z * z * z
+    return 0
+"""
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("slice", [False, True])
+def test_timeout(jobs, slice):
+    with pytest.raises(CheckFailures) as exc_info:
+        check(UNDECIDED, jobs=jobs, slice=slice, all_failures=True, timeout=0.2)
+    failures = exc_info.value.failures
+    assert failing_lines(exc_info.value) == [4, 5, 6]
+    assert [type(failure) for failure in failures] == [
+        CheckUnknown,
+        CheckFailed,
+        CheckUnknown,
+    ]
+    assert failures[0].reason == "timeout"
+
+
+def test_budget():
+    start = time.perf_counter()
+    with pytest.raises(CheckFailures) as exc_info:
+        check(UNDECIDED, all_failures=True, budget=0.3)
+    assert time.perf_counter() - start < 5
+    # The budget runs out during the first assert, so the others are not solved
+    assert [type(failure) for failure in exc_info.value.failures] == [CheckUnknown] * 3
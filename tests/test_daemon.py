@@ -0,0 +1,111 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from benchmarks.imports import VERIFICATION_MODULES, import_profile
+from py2smt import client
+from py2smt.__main__ import main as check_main
+from py2smt.daemon import VerificationServer
+
+PROGRAM = """
+a = 1
+assert a == 2
+b = 3
+assert b == 4
+"""
+
+# Fermat's last theorem for cubes, which z3 does not prove
+SLOW_PROGRAM = """
+@assumes(param.x > 0, param.y > 0, param.z > 0)
+def fermat(x: int, y: int, z: int) -> int:
+    assert x * x * x + y * y * y != z * z * z
+    return 0
+"""
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    path = str(tmp_path / "py2smt.sock")
+    with VerificationServer(path) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        yield path
+        server.shutdown()
+        thread.join()
+
+
+def test_check(socket_path):
+    with client.Client(socket_path) as connection:
+        assert connection.check("a = 1\nassert a == 1")["status"] == "ok"
+        response = connection.check(PROGRAM, all_failures=True)
+    assert response["status"] == "failed"
+    assert [failure["lineno"] for failure in response["failures"]] == [3, 5]
+    assert response["failures"][0]["values"] == [{"name": "a", "lineno": 2, "value": 1}]
+
+
+def test_error(socket_path):
+    with client.Client(socket_path) as connection:
+        response = connection.check("a = 1.5 +")
+        assert response["status"] == "error"
+        assert response["output"][-1].startswith("SyntaxError")
+        assert connection.check("", foo=1)["status"] == "error"
+
+
+def test_invalid_requests(socket_path):
+    with client.Client(socket_path) as connection:
+        requests = [[], 1, {"source": "assert True"}, {"id": 2, "cancel": []}]
+        for request, request_id in zip(requests, [None, None, None, 2]):
+            connection.send(request)
+            assert connection.receive() == {
+                "id": request_id,
+                "status": "error",
+                "output": [mock.ANY],
+            }
+        connection.send({"id": 3, "source": "assert True", "options": []})
+        assert connection.receive()["id"] == 3
+        # The connection still serves checks
+        assert connection.check("assert True")["status"] == "ok"
+
+
+def test_client_output(socket_path, tmp_path, capsys):
+    path = tmp_path / "program.py"
+    path.write_text(PROGRAM)
+    assert check_main(["--all", str(path)]) == 1
+    expected = capsys.readouterr().out
+
+    assert client.main(["--socket", socket_path, "--all", str(path)]) == 1
+    assert capsys.readouterr().out == expected
+
+
+def test_cancel(socket_path):
+    with client.Client(socket_path) as connection:
+        request_id = connection.submit(SLOW_PROGRAM)
+        connection.cancel(request_id)
+        assert connection.receive() == {
+            "id": request_id,
+            "status": "cancelled",
+            "output": [],
+        }
+
+        # Cancel a running check from another connection
+        request_id = connection.submit(SLOW_PROGRAM)
+        time.sleep(0.5)
+        with client.Client(socket_path) as other:
+            other.cancel(request_id)
+        assert connection.receive()["status"] == "cancelled"
+
+
+def test_client_unknown_strategy(tmp_path, capsys):
+    path = tmp_path / "program.py"
+    path.write_text(PROGRAM)
+    # Rejected before connecting to the server
+    with pytest.raises(SystemExit):
+        client.main(["--socket", "missing.sock", "--portfolio", "smt,fast", str(path)])
+    assert "Unknown strategy 'fast'" in capsys.readouterr().err
+
+
+def test_client_loads_no_verification_modules():
+    loaded = import_profile("py2smt.client")["modules"]
+    assert [name for name in VERIFICATION_MODULES if name in loaded] == []
@@ -5,11 +5,22 @@ import pytest
 from py2smt.check import CheckFailed, check
 
 
-def test_integration(testfile_name):
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"jobs": 2},
+        {"slice": True},
+        {"assumption_literals": True},
+        {"optimize": False},
+    ],
+    ids=["default", "parallel", "sliced", "assumption_literals", "unoptimized"],
+)
+def test_integration(testfile_name, options):
     correct = not testfile_name.endswith("incorrect.py")
     data = Path(testfile_name).read_text()
     if correct:
-        check(data)
+        check(data, **options)
     else:
         with pytest.raises(CheckFailed):
-            check(data)
+            check(data, **options)
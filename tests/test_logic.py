@@ -0,0 +1,75 @@
+import pytest
+
+from py2smt.check import check, lower, validity_scopes
+from py2smt.lir import DependencyIndex
+from py2smt.lir.logic import INT, NONLINEAR, REAL, logic_name
+
+NONLINEAR_FUNCTION = """
+from py2smt import __return__, ensures, param
+
+
+@ensures(__return__ == param.a * param.b)
+def times(a: int, b: int) -> int:
+    return a * b
+
+
+x = 1
+assert x + 1 == 2
+y = times(x, 3)
+assert y == 3
+"""
+
+
+def scope_logics(program: str):
+    _, model = lower(program, optimize=False)
+    return model.logic, [scope.logic for scope in validity_scopes(model)]
+
+
+def test_logic_name():
+    assert logic_name(0) == "QF_UF"
+    assert logic_name(INT) == "QF_LIA"
+    assert logic_name(INT | NONLINEAR) == "QF_NIA"
+    assert logic_name(REAL) == "QF_LRA"
+    assert logic_name(INT | REAL | NONLINEAR) == "QF_NIRA"
+
+
+@pytest.mark.parametrize(
+    "program,logic",
+    [
+        ("a = True\nassert a", "QF_UF"),
+        ("a = 1\nassert a + 1 == 2", "QF_LIA"),
+        ("a = 1\nassert 3 * a == 3", "QF_LIA"),
+        ("a = 1\nassert a // 2 == 0", "QF_LIA"),
+        ("a = 1\nassert a * a == 1", "QF_NIA"),
+        ("a = 2\nassert 4 % a == 0", "QF_NIA"),
+    ],
+)
+def test_infer_logic(program, logic):
+    assert scope_logics(program) == (logic, [logic])
+
+
+def test_scope_logic():
+    # A validity scope is in the logic of the assumptions before it
+    program = "a = 1\nassert a == 1\nb = a * a\nassert b == 1"
+    assert scope_logics(program) == ("QF_NIA", ["QF_LIA", "QF_NIA"])
+
+
+def test_query_logic():
+    # The function comes first, but the slice of the first module assert does
+    # not need its nonlinear body
+    _, model = lower(NONLINEAR_FUNCTION, optimize=False)
+    index = DependencyIndex(model)
+    assert [query.logic for query in index.queries()] == [
+        "QF_NIA",
+        "QF_LIA",
+        "QF_NIA",
+    ]
+    assert index.slice(0).to_smt()[0] == "(set-logic QF_NIA)"
+
+
+@pytest.mark.parametrize("slice", [False, True])
+def test_profile_logic(slice):
+    profile = check(NONLINEAR_FUNCTION, optimize=False, slice=slice)
+    logics = [query.logic for query in profile.queries]
+    assert logics == (["QF_NIA", "QF_LIA", "QF_NIA"] if slice else ["QF_NIA"] * 3)
+    assert "QF_NIA" in "\n".join(profile.format_table())
@@ -0,0 +1,77 @@
+import pytest
+
+from py2smt.check import CheckFailed, check, get_smt
+
+CLAMP = """
+from py2smt import __return__, assumes, ensures, param
+
+
+@assumes(param.a < param.b)
+@ensures(__return__ >= param.a, __return__ <= param.b)
+def clamp(a: int, b: int, c: int) -> int:
+    if c < a:
+        ret = a
+    elif c > b:
+        ret = b
+    else:
+        ret = c
+    return ret
+
+
+x = clamp(0, 4, 6)
+assert x <= 4
+"""
+
+
+def results(text: str, **options):
+    return [query.result for query in check(text, **options).queries]
+
+
+def test_propagate_constants():
+    assert get_smt("a = 1\nb = a + 2") == [
+        "(set-logic QF_LIA)",
+        "(declare-fun a$0$0 () Int)",
+        "(declare-fun b$0$0 () Int)",
+        "(assert (= a$0$0 1))",
+        "(assert (= b$0$0 3))",
+    ]
+
+
+@pytest.mark.parametrize(
+    "expr,value",
+    [
+        ("7 // 2", 3),
+        ("-7 // 2", "(- 4)"),
+        ("7 % -2", 1),
+        ("-7 % 2", 1),
+        ("7 // -2", "(- 3)"),
+    ],
+)
+def test_fold_smt_division(expr, value):
+    assert get_smt(f"a = {expr}")[-1] == f"(assert (= a$0$0 {value}))"
+
+
+def test_discharge_assert():
+    assert results("a = 2\nb = a * 3\nassert b == 6 and b > a") == ["proven"]
+    assert results("a = 2\nassert a == 2", optimize=False) == ["unsat"]
+
+
+def test_discharge_unreachable_assert():
+    program = """
+a = 1
+if a > 2:
+    assert a == 5
+"""
+    assert results(program) == ["proven"]
+
+
+def test_discharge_precondition():
+    # The precondition `0 < 4` is proven without the solver, the postcondition
+    # still needs it
+    assert results(CLAMP) == ["unsat", "proven", "unsat"]
+
+
+def test_fold_failing_assert():
+    with pytest.raises(CheckFailed) as exc:
+        check("a = 1\nassert a == 2")
+    assert exc.value.context.ast_node.lineno == 2
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+from py2smt.check import CheckFailed, CheckFailures, CheckUnknown, check
+from py2smt.portfolio import Strategy
+from py2smt.profile import Profile
+
+LOOP = Path("tests/integration/loop_3_correct.py").read_text()
+
+NONLINEAR = """
+@assumes(param.x > 0, param.y > 0)
+def area(x: int, y: int) -> int:
+    assert x * y != 12
+    return x * y
+"""
+
+# Fermat's last theorem for cubes, which z3 does not prove
+UNDECIDED = """
+@assumes(param.x > 0, param.y > 0, param.z > 0)
+def fermat(x: int, y: int, z: int) -> int:
+    assert x * x * x + y * y * y != z * z * z
+    return 0
+"""
+
+
+def test_parse():
+    assert Strategy.parse("simple") == Strategy("simple")
+    assert Strategy.parse("nia:2.5") == Strategy("nia", 2.5)
+    with pytest.raises(ValueError):
+        Strategy.parse("fast")
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("slice", [False, True])
+def test_race(jobs, slice):
+    profile = check(LOOP, jobs=jobs, slice=slice, portfolio=["simple", "smt", "nia"])
+    solved = [query for query in profile.queries if query.result == "unsat"]
+    assert solved
+    assert all(query.strategy in ("simple", "smt", "nia") for query in solved)
+
+
+def test_escalate():
+    profile = Profile()
+    with pytest.raises(CheckFailed) as exc_info:
+        check(NONLINEAR, profile, portfolio=["nla2bv:1", "simple"], escalate=True)
+    assert exc_info.value.context.ast_node.lineno == 4
+    assert [(query.result, query.strategy) for query in profile.queries] == [
+        ("sat", "nla2bv")
+    ]
+
+    # nla2bv cannot prove the postcondition, so it escalates to the next strategy
+    profile = check(LOOP, portfolio=["nla2bv:1", "simple"], escalate=True)
+    assert "simple" in {query.strategy for query in profile.queries}
+
+
+def test_unknown():
+    with pytest.raises(CheckUnknown) as exc_info:
+        check(UNDECIDED, portfolio=["nla2bv", "simple:0.2"], escalate=True)
+    assert exc_info.value.reason.startswith("nla2bv: ")
+    assert exc_info.value.reason.endswith(", simple: timeout")
+
+    with pytest.raises(CheckFailures) as exc_info:
+        check(UNDECIDED, portfolio=["simple", "nia"], timeout=0.2, all_failures=True)
+    assert [type(failure) for failure in exc_info.value.failures] == [CheckUnknown]
@@ -1,5 +1,5 @@
-from py2smt.mir.lower import Branch
-from py2smt.mir.types import Assign, Constant, Ident, Var
+from py2smt.mir.lower import ITE, Branch
+from py2smt.mir.types import Assign, Call, Constant, Ident, Var
 
 
 def test_simple_reconcile():
@@ -10,13 +10,12 @@ def test_simple_reconcile():
 
     assigns = scope.reconcile_subscopes()
     assert scope.variables["test"] == [
-        Var(ident=Ident("test"), type_=int, version=0, scope=[0, 0]),
         Var(ident=Ident("test"), type_=int, version=0, scope=[0]),
     ]
 
     assert assigns == [
         Assign(
-            path_condition=sub1.condition,
+            path_condition=[],
             lhs=Var(ident=Ident("test"), type_=int, version=0, scope=[0]),
             rhs=Var(ident=Ident("test"), type_=int, version=0, scope=[0, 0]),
         ),
@@ -25,13 +24,16 @@ def test_simple_reconcile():
 
 def test_full():
     scope = Branch()
-    sub1 = scope.subscope(Constant(type_=bool, value=False))
+    cond1 = Constant(type_=bool, value=False)
+    sub1 = scope.subscope(cond1)
     assert sub1.canonical_idx() == [0, 0]
 
-    sub2 = scope.subscope(Constant(type_=bool, value=True))
+    cond2 = Constant(type_=bool, value=True)
+    sub2 = scope.subscope(cond2)
     assert sub2.canonical_idx() == [0, 1]
 
     scope.store_var(Ident("b"), int)
+    scope.store_var(Ident("c"), int)
 
     sub1.store_var(Ident("a"), int)
     sub2.store_var(Ident("a"), int)
@@ -41,66 +43,103 @@ def test_full():
     assigns = scope.reconcile_subscopes()
     assert scope.variables == {
         Ident("a"): [
-            Var(
-                version=0,
-                scope=[0, 0],
-                type_=int,
-                ident=Ident("a"),
-            ),
-            Var(
-                version=0,
-                scope=[0, 1],
-                type_=int,
-                ident=Ident("a"),
-            ),
-            Var(
-                version=0,
-                scope=[0],
-                type_=int,
-                ident=Ident("a"),
-            ),
+            Var(version=0, scope=[0], type_=int, ident=Ident("a")),
         ],
         Ident("b"): [
-            Var(
-                version=0,
-                scope=[0],
-                type_=int,
-                ident=Ident("b"),
-            ),
-            Var(
-                version=0,
-                scope=[0, 1],
-                type_=int,
-                ident=Ident("b"),
-            ),
-            Var(
-                version=1,
-                scope=[0],
-                type_=int,
-                ident=Ident("b"),
-            ),
+            Var(version=0, scope=[0], type_=int, ident=Ident("b")),
+            Var(version=1, scope=[0], type_=int, ident=Ident("b")),
+        ],
+        # Unchanged in both subscopes, so not merged
+        Ident("c"): [
+            Var(version=0, scope=[0], type_=int, ident=Ident("c")),
         ],
     }
 
     assert assigns == [
         Assign(
-            path_condition=sub1.condition,
+            path_condition=[],
             lhs=Var(version=0, scope=[0], type_=int, ident=Ident("a")),
-            rhs=Var(version=0, scope=[0, 0], type_=int, ident=Ident("a")),
-        ),
-        Assign(
-            path_condition=sub2.condition,
-            lhs=Var(version=0, scope=[0], type_=int, ident=Ident("a")),
-            rhs=Var(version=0, scope=[0, 1], type_=int, ident=Ident("a")),
+            rhs=Call(
+                type_=int,
+                func=ITE,
+                args=[
+                    cond1,
+                    Var(version=0, scope=[0, 0], type_=int, ident=Ident("a")),
+                    Var(version=0, scope=[0, 1], type_=int, ident=Ident("a")),
+                ],
+            ),
         ),
         Assign(
-            path_condition=sub1.condition,
+            path_condition=[],
             lhs=Var(version=1, scope=[0], type_=int, ident=Ident("b")),
-            rhs=Var(version=0, scope=[0], type_=int, ident=Ident("b")),
+            rhs=Call(
+                type_=int,
+                func=ITE,
+                args=[
+                    # `sub1` keeps the version from before the subscopes
+                    cond1,
+                    Var(version=0, scope=[0], type_=int, ident=Ident("b")),
+                    Call(
+                        type_=int,
+                        func=ITE,
+                        args=[
+                            cond2,
+                            Var(version=0, scope=[0, 1], type_=int, ident=Ident("b")),
+                            Var(version=0, scope=[0], type_=int, ident=Ident("b")),
+                        ],
+                    ),
+                ],
+            ),
         ),
+    ]
+
+
+def test_exhaustive_reconcile():
+    scope = Branch()
+    cond = Constant(type_=bool, value=True)
+    then = scope.subscope(cond)
+    orelse = scope.subscope(Constant(type_=bool, value=False))
+    scope.store_var(Ident("a"), int)
+
+    then.store_var(Ident("a"), int)
+    orelse.store_var(Ident("a"), int)
+
+    assert scope.reconcile_subscopes(exhaustive=True) == [
         Assign(
-            path_condition=sub2.condition,
-            lhs=Var(version=1, scope=[0], type_=int, ident=Ident("b")),
-            rhs=Var(version=0, scope=[0, 1], type_=int, ident=Ident("b")),
+            path_condition=[],
+            lhs=Var(version=1, scope=[0], type_=int, ident=Ident("a")),
+            rhs=Call(
+                type_=int,
+                func=ITE,
+                args=[
+                    cond,
+                    Var(version=0, scope=[0, 0], type_=int, ident=Ident("a")),
+                    Var(version=0, scope=[0, 1], type_=int, ident=Ident("a")),
+                ],
+            ),
         ),
     ]
+
+
+def test_sequential_reconcile():
+    # if c > 0: a = 1
+    # if c > 1: b = 2
+    scope = Branch()
+    scope.store_var(Ident("a"), int)
+    scope.store_var(Ident("b"), int)
+
+    scope.subscope(Constant(type_=bool, value=True)).store_var(Ident("a"), int)
+    scope.subscope(Constant(type_=bool, value=False))
+    assert [a.lhs.ident for a in scope.reconcile_subscopes(exhaustive=True)] == [
+        Ident("a")
+    ]
+
+    scope.subscope(Constant(type_=bool, value=True)).store_var(Ident("b"), int)
+    scope.subscope(Constant(type_=bool, value=False))
+    assigns = scope.reconcile_subscopes(exhaustive=True)
+    assert [a.lhs for a in assigns] == [
+        Var(version=1, scope=[0], type_=int, ident=Ident("b")),
+    ]
+    assert len(scope.variables[Ident("a")]) == 2
+    # The index keeps growing, so the merged subscopes are not reused
+    assert scope.subscope().canonical_idx() == [0, 4]
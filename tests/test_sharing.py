@@ -0,0 +1,53 @@
+from py2smt import lir
+from py2smt.check import check, lower
+
+PROGRAM = """
+a = 1
+b = (a + 1) * 2
+c = (a + 1) * 2
+"""
+
+
+def test_share_equal_terms():
+    _, model = lower(PROGRAM, optimize=False)
+    assert model.body[1].expr.args[1] is model.body[2].expr.args[1]
+    assert [define.to_smt() for define in model.shared] == [
+        "(define-fun !term0 () Int (* (+ a$0$0 1) 2))"
+    ]
+    assert lir.Model(model.function_defs, model.body[1:], model.shared).to_smt() == (
+        "(declare-fun a$0$0 () Int)\n"
+        "(declare-fun b$0$0 () Int)\n"
+        "(declare-fun c$0$0 () Int)\n"
+        "(define-fun !term0 () Int (* (+ a$0$0 1) 2))\n"
+        "(assert (= b$0$0 !term0))\n"
+        "(assert (= c$0$0 !term0))\n"
+    )
+
+
+def test_build_z3_terms_once():
+    _, model = lower(PROGRAM, optimize=False)
+    env = lir.Z3Env(model.function_defs)
+    for stmt in model.body:
+        stmt.to_z3(env)
+    # `(= a 1)`, `(+ a 1)`, `(* (+ a 1) 2)` and the two assignments of it
+    assert len(env.terms) == 5
+
+
+def test_named_expr_rhs_once():
+    program = """
+from py2smt import __return__, assumes, ensures, param
+
+
+@assumes(param.a > 0)
+@ensures(__return__ == param.a)
+def pos(a: int) -> int:
+    return a
+
+
+b = 1
+c = (d := pos(b)) + d
+assert c == 2
+"""
+    # The body of `pos`, its precondition at the single call and the assert
+    queries = check(program, optimize=False).queries
+    assert [query.lineno for query in queries] == [6, 12, 13]
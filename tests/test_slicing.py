@@ -0,0 +1,58 @@
+import pytest
+
+from py2smt.check import CheckFailed, check, lower
+from py2smt.lir import DependencyIndex
+
+PROGRAM = """
+from py2smt import __return__, ensures, param
+
+
+@ensures(__return__ == param.a + param.b)
+def plus(a: int, b: int) -> int:
+    return a + b
+
+
+x = plus(1, 2)
+y = plus(3, 4)
+if x > 2:
+    z = 1
+else:
+    z = 2
+assert y == 7
+assert z == 1
+"""
+
+
+def sliced_smt(program: str):
+    _, model = lower(program, optimize=False)
+    return [query.to_smt() for query in DependencyIndex(model).queries()]
+
+
+def test_slice_leaves_out_unrelated():
+    body, y, z = sliced_smt(PROGRAM)
+    # Only the postcondition of the second call is needed for `y`
+    assert not any("x$" in line or "z$" in line for line in y)
+    assert any("y$" in line for line in y)
+    # `z` depends on `x` through the guards of the branches
+    assert any("!guard" in line for line in z)
+    assert any("x$" in line for line in z)
+    assert not any("y$" in line for line in z)
+    # Functions are checked without anything from the module
+    assert not any("$" in line for line in body[:-1] if "plus!" not in line)
+
+
+def test_slice_only_prior_assumptions():
+    _, model = lower("a = 1\nassert a == 1\nb = a\nassert b == 1", optimize=False)
+    first, second = DependencyIndex(model).queries()
+    assert len(first.assumptions) == 1
+    assert len(second.assumptions) == 2
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_sliced_failure(jobs):
+    with pytest.raises(CheckFailed) as exc:
+        check(PROGRAM.replace("z == 1", "z == 2"), slice=True, jobs=jobs)
+    assert exc.value.context.ast_node.lineno == 17
+    idents = {var.ident.ident for _, var in exc.value.model}
+    assert "x$0$0" in idents and "z$0$0" in idents
+    assert "y$0$0" not in idents
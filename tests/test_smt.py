@@ -1,7 +1,9 @@
+import io
 from typing import List
 
 import z3  # type: ignore
 
+from py2smt import lir
 from py2smt.check import get_smt
 
 
@@ -23,9 +25,13 @@ def normalize_whitespace(smt: str):
     return "".join(filter(ws_filter, smt))
 
 
-def check_smt(text: str, smt: List[str], sat: bool = True):
-    actual = [s for smt in get_smt(text) for s in smt.splitlines()]
-    expected = smt
+def check_smt(
+    text: str, smt: List[str], sat: bool = True, logic: str = "QF_LIA", **options
+):
+    actual = [
+        s for smt in get_smt(text, optimize=False, **options) for s in smt.splitlines()
+    ]
+    expected = [f"(set-logic {logic})", *smt]
     assert actual == expected
     z3_inp = z3.parse_smt2_string("\n".join(actual))
     solver = z3.SimpleSolver()
@@ -107,6 +113,27 @@ assert a
     check_smt(program, smt)
 
 
+def test_assert_assumption_literals():
+    program = """
+a = 1
+assert a
+assert a > 0
+"""
+    smt = [
+        "(declare-fun a$0$0 () Int)",
+        "(assert (= a$0$0 1))",
+        "(declare-fun !scope0 () Bool)",
+        "(assert (=> !scope0 (and (not (not (= a$0$0 0))))))",
+        "(check-sat-assuming (!scope0))",
+        "(assert (not !scope0))",
+        "(declare-fun !scope1 () Bool)",
+        "(assert (=> !scope1 (and (not (> a$0$0 0)))))",
+        "(check-sat-assuming (!scope1))",
+        "(assert (not !scope1))",
+    ]
+    check_smt(program, smt, assumption_literals=True)
+
+
 def test_if():
     program = """
 a = 0
@@ -117,13 +144,49 @@ else:
 """
     smt = [
         "(declare-fun a$0$0 () Int)",
+        "(declare-fun !guard$0_0$0 () Bool)",
+        "(declare-fun !guard$0_1$0 () Bool)",
         "(declare-fun b$0_0$0 () Int)",
         "(declare-fun b$0_1$0 () Int)",
         "(declare-fun b$0$0 () Int)",
+        "(define-fun !term0 () Bool (not (= a$0$0 0)))",
         "(assert (= a$0$0 0))",
-        "(assert (=> (not (= a$0$0 0)) (= b$0_0$0 1)))",
-        "(assert (=> (not (not (= a$0$0 0))) (= b$0_1$0 2)))",
-        "(assert (=> (not (= a$0$0 0)) (= b$0$0 b$0_0$0)))",
-        "(assert (=> (not (not (= a$0$0 0))) (= b$0$0 b$0_1$0)))",
+        "(assert (= !guard$0_0$0 !term0))",
+        "(assert (=> !guard$0_0$0 (= b$0_0$0 1)))",
+        "(assert (= !guard$0_1$0 (not !term0)))",
+        "(assert (=> !guard$0_1$0 (= b$0_1$0 2)))",
+        "(assert (= b$0$0 (ite !term0 b$0_0$0 b$0_1$0)))",
     ]
     check_smt(program, smt)
+
+
+def test_write_deep_expression():
+    expr = lir.Ident("x")
+    for _ in range(100_000):
+        expr = lir.Call(func="not", args=[expr])
+    stream = io.StringIO()
+    lir.write_smt(lir.Assume(expr), stream)
+    assert stream.getvalue() == "(assert " + "(not " * 100_000 + "x" + ")" * 100_001
+
+
+def test_contract_template():
+    program = """
+from py2smt import __return__, assumes, ensures, param
+
+
+@assumes(param.a > 0)
+@ensures(__return__ == param.a)
+def pos(a: int) -> int:
+    return a
+
+
+b = pos(1)
+c = pos(b)
+"""
+    smt = get_smt(program, optimize=False)
+    assert [line for line in smt if line.startswith("(define-fun")] == [
+        "(define-fun pos!pre ((pos!pre!a$0$0 Int)) Bool (> pos!pre!a$0$0 0))",
+        "(define-fun pos!post ((pos!post!a$0$0 Int) (pos!post!__return__$0$0 Int))"
+        " Bool (= pos!post!__return__$0$0 pos!post!a$0$0))",
+    ]
+    assert "(assert (pos!post b$0$0 !call_2!__return__$0$0))" in smt
@@ -1,3 +1,9 @@
+import io
+import sys
+
+import pytest
+
+from py2smt import hir, lir, mir
 from py2smt.visitor import Visitor
 
 
@@ -22,3 +28,94 @@ def test_visitor():
     res = vtor.visit(a)
     assert res.b == 4
     assert res.ast_node == 2
+
+
+def test_visit_operands_first():
+    class Leaf:
+        ast_node = None
+
+        def __init__(self, value):
+            self.value = value
+
+    class Pair(Leaf):
+        pass
+
+    class SumVisitor(Visitor):
+        OPERANDS = {Pair: lambda visitor, pair: pair.value}
+
+        def visit_Leaf(self, node):
+            return Leaf(node.value)
+
+        def visit_Pair(self, node, first, second):
+            return Leaf(first.value + second.value)
+
+    # Deeper than the recursion limit
+    depth = sys.getrecursionlimit() * 10
+    tree = Leaf(0)
+    for _ in range(depth):
+        tree = Pair((tree, Leaf(1)))
+    assert SumVisitor().visit(tree).value == depth
+    assert SumVisitor._methods.keys() == {Leaf, Pair}
+
+
+def test_visit_tree_adds_ast():
+    class Leaf:
+        ast_node = None
+
+        def __init__(self, value, ast_node=None):
+            self.value = value
+            self.ast_node = ast_node
+
+    class Pair(Leaf):
+        pass
+
+    class ListVisitor(Visitor):
+        OPERANDS = {Pair: lambda visitor, pair: pair.value}
+
+        def visit_Leaf(self, node):
+            return [Leaf(node.value)]
+
+        def visit_Pair(self, node, first, second):
+            return first + second + [Leaf(None, ast_node="own")]
+
+    tree = Pair(
+        (Pair((Leaf(1, "one"), Leaf(2, "two")), "inner"), Leaf(3, "three")), "root"
+    )
+    assert [leaf.ast_node for leaf in ListVisitor().visit(tree)] == [
+        "one",
+        "two",
+        "own",
+        "three",
+        "own",
+    ]
+
+
+@pytest.mark.parametrize("optimize", [False, True])
+def test_lower_deep_expression(optimize):
+    # Python's parser does not take expressions this deep, so build the HIR
+    depth = 20000
+    expr = hir.Name(type_=int, ident="x", ctx=hir.ExprContext.LOAD)
+    for _ in range(depth):
+        one = hir.Constant(type_=int, value=1)
+        expr = hir.BinExpr(type_=int, op=hir.BinOperator.ADD, lhs=expr, rhs=one)
+    store = hir.Name(type_=int, ident="x", ctx=hir.ExprContext.STORE)
+    module = hir.Module(
+        body=[
+            hir.Assign(lhs=store, rhs=hir.Constant(type_=int, value=0)),
+            hir.Assert(
+                test=hir.BinExpr(
+                    type_=bool,
+                    op=hir.BinOperator.EQ,
+                    lhs=expr,
+                    rhs=hir.Constant(type_=int, value=depth),
+                )
+            ),
+        ]
+    )
+    mir_ = mir.lower_hir_to_mir(module)
+    if optimize:
+        mir_ = mir.optimize_mir(mir_)
+    model = lir.share_subterms(lir.lower_mir_to_lir(mir_))
+    smt = io.StringIO()
+    lir.write_smt(model, smt)
+    assert smt.getvalue().count("(+ ") == (0 if optimize else depth)
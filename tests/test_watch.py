@@ -0,0 +1,73 @@
+import os
+import time
+
+from py2smt.watch import Watcher
+
+PROGRAM = """
+@ensures(__return__ == param.a + 1)
+def inc(a: int) -> int:
+    return a + 1
+
+x = inc(1)
+assert x == 2
+"""
+
+# Fermat's last theorem for cubes, which z3 does not prove
+SLOW_PROGRAM = """
+@assumes(param.x > 0, param.y > 0, param.z > 0)
+def fermat(x: int, y: int, z: int) -> int:
+    assert x * x * x + y * y * y != z * z * z
+    return 0
+"""
+
+
+def write(path, text: str):
+    # Replace the file at once, so the watcher does not see it half written
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def next_result(watcher: Watcher, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = watcher.step()
+        if result is not None:
+            return result
+    raise TimeoutError
+
+
+def test_recheck_changes(tmp_path):
+    path = tmp_path / "program.py"
+    path.write_text(PROGRAM)
+    watcher = Watcher([str(tmp_path)], str(tmp_path / "cache"), interval=0.01)
+    try:
+        result = next_result(watcher)
+        assert result.status == "ok"
+        assert [query.lineno for query in result.profile.queries] == [2, 7]
+
+        write(path, PROGRAM + "assert x == 3\n")
+        result = next_result(watcher)
+        assert result.status == "failed"
+        # The function and the first assert did not change
+        assert [query.lineno for query in result.profile.queries] == [8]
+    finally:
+        watcher.close()
+
+
+def test_cancel_on_change(tmp_path):
+    path = tmp_path / "program.py"
+    path.write_text(SLOW_PROGRAM)
+    watcher = Watcher([str(path)], str(tmp_path / "cache"), interval=0.01)
+    try:
+        assert watcher.step() is None
+        assert watcher.running is not None
+        process = watcher.running[1]
+
+        write(path, PROGRAM)
+        result = next_result(watcher)
+        assert watcher.cancelled == [str(path)]
+        assert not process.is_alive()
+        assert result.status == "ok"
+    finally:
+        watcher.close()